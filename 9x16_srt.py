@@ -1,15 +1,28 @@
 import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
 from PIL import Image, ImageFilter
-import json
+import orjson
+import numpy as np
+import contextlib
+import functools
+import hashlib
+import io
 import re
 import os
 from dotenv import load_dotenv
 import time
 import random
+import threading
+import subprocess
+import shutil
+import tempfile
 import requests
-from moviepy.editor import VideoFileClip, concatenate_videoclips, AudioFileClip
-from pydub import AudioSegment
-import whisper
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import aiohttp
+from faster_whisper import WhisperModel
+import ctranslate2
 
 # =====================================
 # CONFIG
@@ -38,12 +51,36 @@ SCENE_FILES = {
 FINAL_VIDEO = os.getenv("FINAL_VIDEO", "final_reel_ad_9x16.mp4")
 FINAL_VIDEO_WITH_VOICE = os.getenv("FINAL_VIDEO_WITH_VOICE", "final_video_with_voice.mp4")
 
+FFMPEG_BINARY = os.getenv("FFMPEG_BINARY", "ffmpeg")
+FFPROBE_BINARY = os.getenv("FFPROBE_BINARY", "ffprobe")
+
 TARGET_W = int(os.getenv("TARGET_WIDTH", 432))
 TARGET_H = int(os.getenv("TARGET_HEIGHT", 768))
 
+# Background blur is done at 1/BG_BLUR_SCALE size; two BoxBlur(9) passes ~ Gaussian sigma 7.5 there (30 at full size)
+BG_BLUR_SCALE = 4
+BG_BOX_RADIUS = 9
+
 VOICE_ID = os.getenv("VOICE_ID", "21m00Tcm4TlvDq8ikWAM")
+# Turbo v2.5 renders far faster than Multilingual v2; override with ELEVEN_MODEL_ID
+ELEVEN_MODEL_ID = os.getenv("ELEVEN_MODEL_ID", "eleven_turbo_v2_5")
+ELEVEN_STREAMING_LATENCY = os.getenv("ELEVEN_STREAMING_LATENCY", "3")
+
+# Client-side concurrency caps (match the plan tiers) so parallel requests queue instead of hitting 429s
+ELEVEN_CONCURRENCY = int(os.getenv("ELEVEN_CONCURRENCY", 3))
+GEMINI_CONCURRENCY = int(os.getenv("GEMINI_CONCURRENCY", 5))
+API_MAX_RETRIES = 5
+_ELEVEN_SEM = threading.BoundedSemaphore(ELEVEN_CONCURRENCY)
+_GEMINI_SEM = threading.BoundedSemaphore(GEMINI_CONCURRENCY)
 OUTPUT_AUDIO = os.getenv("OUTPUT_AUDIO", "final_voice.mp3")
-SAFE_AUDIO = os.getenv("SAFE_AUDIO", "final_voice_safe.mp3")
+
+# Gemini responses are cached on disk keyed by model + prompt + input file hashes; a TTL of 0 disables it
+GEMINI_CACHE_DIR = os.getenv("GEMINI_CACHE_DIR", ".cache")
+GEMINI_CACHE_TTL = float(os.getenv("GEMINI_CACHE_TTL_DAYS", 7)) * 86400
+# ElevenLabs audio is cached by script + voice + model; oldest entries are evicted past the size cap
+TTS_CACHE_DIR = os.path.join(GEMINI_CACHE_DIR, "tts")
+TTS_CACHE_TTL = float(os.getenv("TTS_CACHE_TTL_DAYS", 30)) * 86400
+TTS_CACHE_MAX_BYTES = int(float(os.getenv("TTS_CACHE_MAX_GB", 2)) * 1024 ** 3)
 
 model = genai.GenerativeModel(os.getenv("GEMINI_MODEL", "gemini-2.5-flash"))
 
@@ -54,6 +91,76 @@ model = genai.GenerativeModel(os.getenv("GEMINI_MODEL", "gemini-2.5-flash"))
 SRT_OUTPUT = "ainsta_caption.srt"
 MAX_WORDS = 3
 WHISPER_MODEL_SIZE = "small"
+# Ask CTranslate2 directly instead of importing torch just for device detection
+WHISPER_DEVICE = "cuda" if ctranslate2.get_cuda_device_count() > 0 else "cpu"
+# CTranslate2 quantized weights: int8 on CPU, int8 weights with fp16 activations on GPU
+WHISPER_COMPUTE_TYPE = "int8_float16" if WHISPER_DEVICE == "cuda" else "int8"
+
+# Silero VAD skips silence/music-only stretches before decoding; timestamps stay in video time
+WHISPER_VAD = os.getenv("WHISPER_VAD", "1") == "1"
+WHISPER_SAMPLE_RATE = 16000
+
+_WHISPER = None
+_WHISPER_LOCK = threading.Lock()
+
+def _get_whisper():
+    """Load the Whisper model once per process (lazily, so app.py can override WHISPER_MODEL_SIZE first)"""
+    global _WHISPER
+    if _WHISPER is not None:
+        return _WHISPER
+    with _WHISPER_LOCK:
+        if _WHISPER is None:
+            print(f"INFO: Loading Whisper '{WHISPER_MODEL_SIZE}' on {WHISPER_DEVICE} ({WHISPER_COMPUTE_TYPE})...")
+            model = WhisperModel(WHISPER_MODEL_SIZE, device=WHISPER_DEVICE, compute_type=WHISPER_COMPUTE_TYPE)
+            # One second of silence runs the first (slow) inference before any real request does
+            list(model.transcribe(np.zeros(WHISPER_SAMPLE_RATE, dtype=np.float32))[0])
+            _WHISPER = model
+    return _WHISPER
+
+def load_audio_16k(video_path):
+    """Decode the audio track to 16 kHz mono float32 with ffmpeg (the format Whisper consumes)"""
+    proc = subprocess.run(
+        [FFMPEG_BINARY, "-nostdin", "-hide_banner", "-loglevel", "error", "-i", video_path,
+         "-vn", "-ac", "1", "-ar", str(WHISPER_SAMPLE_RATE), "-f", "s16le", "-"],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed ({proc.returncode}): {proc.stderr.decode(errors='replace').strip()}")
+    return np.frombuffer(proc.stdout, np.int16).astype(np.float32) / 32768.0
+
+# =====================================
+# SCENE CONCURRENCY CONFIG
+# =====================================
+
+SCENE_WORKERS = int(os.getenv("SCENE_WORKERS", 4))
+# Small gap between DEAPI submissions so the four jobs don't hit the API in the same instant
+SCENE_SUBMIT_STAGGER = float(os.getenv("SCENE_SUBMIT_STAGGER", 2.5))
+
+# DEAPI status polling backoff (seconds)
+POLL_MIN_DELAY = 1.0
+POLL_MAX_DELAY = 8.0
+
+# =====================================
+# HTTP SESSION
+# =====================================
+
+_SESSION = None
+_SESSION_LOCK = threading.Lock()
+
+def _session():
+    """Shared keep-alive session for DEAPI / ElevenLabs so polls and retries reuse TLS connections"""
+    global _SESSION
+    with _SESSION_LOCK:
+        if _SESSION is None:
+            s = requests.Session()
+            # Sized for gunicorn's request threads x concurrent scenes; retries are handled by callers
+            adapter = HTTPAdapter(pool_connections=10, pool_maxsize=50, max_retries=0)
+            s.mount("https://", adapter)
+            s.mount("http://", adapter)
+            # Auth stays per-request: DEAPI_KEY is rotated by app.py and ElevenLabs uses its own header
+            s.headers.update({"User-Agent": "ai-ad-gen/1.0"})
+            _SESSION = s
+    return _SESSION
 
 # =====================================
 # UTIL
@@ -65,20 +172,308 @@ def show_progress_bar(progress):
     bar = "#" * filled + "-" * (bar_length - filled)
     print(f"\r[{bar}] {progress:.1f}%", end="", flush=True)
 
+def _hash_key(prompt, sources):
+    """sha256 over the prompt text and every input (a file path or raw bytes)"""
+    h = hashlib.sha256(prompt.encode("utf-8"))
+    for src in sources:
+        if isinstance(src, (bytes, bytearray)):
+            h.update(src)
+            continue
+        with open(src, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+    return h.hexdigest()
+
+def _gemini_cache_key(prompt, sources):
+    # The model is read at call time (app.py replaces it), so switching GEMINI_MODEL misses the cache
+    return _hash_key(f"{model.model_name}\0{prompt}", sources)
+
+def _cache_path(kind, key):
+    return os.path.join(GEMINI_CACHE_DIR, f"{kind}_{key}.json")
+
+def _write_atomic(path, data):
+    # Readers only ever see a complete file: write a temp file, then rename it into place
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def _cache_load(kind, key):
+    """Cached Gemini response, or None when caching is off, the entry expired or is unreadable"""
+    if GEMINI_CACHE_TTL <= 0:
+        return None
+    path = _cache_path(kind, key)
+    try:
+        if time.time() - os.stat(path).st_mtime > GEMINI_CACHE_TTL:
+            os.remove(path)
+            return None
+        with open(path, "rb") as f:
+            value = orjson.loads(f.read())
+    except FileNotFoundError:
+        return None
+    except (OSError, orjson.JSONDecodeError):
+        # A corrupt entry is a miss; drop it so the next store replaces it
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return None
+    print(f"CACHE: Gemini {kind} hit ({key[:12]})")
+    return value
+
+def _cache_store(kind, key, value):
+    if GEMINI_CACHE_TTL <= 0:
+        return
+    os.makedirs(GEMINI_CACHE_DIR, exist_ok=True)
+    _write_atomic(_cache_path(kind, key), orjson.dumps(value))
+
+def _tts_cache_key(script_text):
+    return _hash_key(f"{VOICE_ID}\0{ELEVEN_MODEL_ID}\0", [script_text.encode("utf-8")])
+
+def _tts_cache_get(key):
+    """Cached MP3 path for key, or None; a hit refreshes its mtime so eviction is LRU"""
+    path = os.path.join(TTS_CACHE_DIR, f"{key}.mp3")
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    if time.time() - st.st_mtime > TTS_CACHE_TTL:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return None
+    os.utime(path)
+    print(f"CACHE: TTS hit ({key[:12]})")
+    return path
+
+def _tts_cache_put(key, src_path):
+    os.makedirs(TTS_CACHE_DIR, exist_ok=True)
+    path = os.path.join(TTS_CACHE_DIR, f"{key}.mp3")
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    shutil.copyfile(src_path, tmp_path)
+    os.replace(tmp_path, path)
+
+    # Evict least recently used entries once the cache outgrows its cap
+    entries = []
+    for entry in os.scandir(TTS_CACHE_DIR):
+        if entry.name.endswith(".mp3"):
+            st = entry.stat()
+            entries.append((st.st_mtime, st.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, old_path in sorted(entries):
+        if total <= TTS_CACHE_MAX_BYTES:
+            break
+        try:
+            os.remove(old_path)
+            total -= size
+        except OSError:
+            pass
+
+def run_ffmpeg(args):
+    """Run ffmpeg with the given arguments, raising with its stderr on failure"""
+    cmd = [FFMPEG_BINARY, "-y", "-hide_banner", "-loglevel", "error"] + list(args)
+    proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed ({proc.returncode}): {proc.stderr.strip()}")
+
+def probe_audio_codec(path):
+    """Codec name of the first audio stream (e.g. 'aac', 'mp3'), or None if there isn't one"""
+    proc = subprocess.run(
+        [FFPROBE_BINARY, "-v", "error", "-select_streams", "a:0",
+         "-show_entries", "stream=codec_name", "-of", "default=nw=1:nk=1", path],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+    )
+    if proc.returncode != 0:
+        return None
+    return proc.stdout.strip() or None
+
+def probe_video_stream(path):
+    """(width, height, fps) of the first video stream, or None if ffprobe can't read it.
+    Cached per (path, mtime, size), so the merge reuses the probe taken when each scene landed."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return _probe_video_stream(path, st.st_mtime_ns, st.st_size)
+
+@functools.lru_cache(maxsize=64)
+def _probe_video_stream(path, mtime_ns, size):
+    # mtime/size are only part of the cache key, so a rewritten (e.g. conformed) clip is probed again
+    try:
+        proc = subprocess.run(
+            [FFPROBE_BINARY, "-v", "error", "-select_streams", "v:0",
+             "-show_entries", "stream=width,height,r_frame_rate", "-of", "json", path],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        )
+    except OSError:
+        return None
+    if proc.returncode != 0:
+        return None
+    streams = orjson.loads(proc.stdout).get("streams") or []
+    if not streams:
+        return None
+    num, _, den = streams[0].get("r_frame_rate", "0/1").partition("/")
+    den = float(den or 1)
+    fps = float(num) / den if den else 0.0
+    return streams[0]["width"], streams[0]["height"], fps
+
+X264_ARGS = ["-c:v", "libx264", "-preset", "ultrafast"]
+
+@functools.lru_cache(maxsize=1)
+def video_encoder_args():
+    """H.264 encoder flags: NVENC when a CUDA GPU and an NVENC-enabled ffmpeg are both present, else libx264"""
+    if ctranslate2.get_cuda_device_count() > 0:
+        try:
+            proc = subprocess.run([FFMPEG_BINARY, "-hide_banner", "-encoders"],
+                                  stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+            if "h264_nvenc" in proc.stdout:
+                return ["-c:v", "h264_nvenc", "-preset", "p1", "-tune", "ll"]
+        except OSError:
+            pass
+    return X264_ARGS
+
+def encode_with_fallback(run):
+    """Call run(encoder_args) with video_encoder_args(); if that NVENC encode fails (no driver libs,
+    session limit reached, ...) run it once more with libx264"""
+    encoder_args = video_encoder_args()
+    try:
+        return run(encoder_args)
+    except RuntimeError as exc:
+        if encoder_args == X264_ARGS:
+            raise
+        print(f"WARNING: NVENC encode failed, retrying with libx264: {exc}")
+        return run(X264_ARGS)
+
+def conform_video(path, width, height, fps):
+    """Rescale/pad a clip in place to width x height at fps so later concats can stream-copy it"""
+    root, ext = os.path.splitext(path)
+    fixed_path = f"{root}.fixed{ext}"
+    encode_with_fallback(lambda encoder_args: run_ffmpeg([
+        "-i", path,
+        "-vf", (f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+                f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1"),
+        "-r", str(fps),
+        *encoder_args,
+        "-c:a", "copy",
+        fixed_path,
+    ]))
+    os.replace(fixed_path, path)
+    return path
+
+def concat_videos(paths, output_path, extra_args=None):
+    """Join clips with ffmpeg's concat demuxer; stream copy unless extra_args asks for an encode"""
+    fd, list_file = tempfile.mkstemp(suffix=".txt", prefix="concat_")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            for p in paths:
+                escaped = os.path.abspath(p).replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+        run_ffmpeg(["-f", "concat", "-safe", "0", "-i", list_file] + (extra_args or ["-c", "copy"]) + [output_path])
+    finally:
+        os.remove(list_file)
+    return output_path
+
+# Files API uploads live for 48h; reuse them (keyed by content hash) a little short of that
+GEMINI_FILE_TTL = 47 * 3600
+_UPLOAD_LOCK = threading.Lock()
+
+def upload_file_cached(source):
+    """Upload a file path or image bytes to the Gemini Files API, reusing an earlier upload of identical bytes"""
+    digest = _hash_key("", [source])
+    index_path = os.path.join(GEMINI_CACHE_DIR, "uploads.json")
+
+    def _load_index():
+        try:
+            with open(index_path, "rb") as f:
+                return orjson.loads(f.read())
+        except (OSError, orjson.JSONDecodeError):
+            return {}
+
+    with _UPLOAD_LOCK:
+        entry = _load_index().get(digest)
+    if entry and entry["expires"] > time.time():
+        try:
+            return genai.get_file(entry["name"])
+        except Exception:
+            pass  # Expired or deleted server-side; upload again
+
+    # Upload outside the lock so several images can upload at once
+    if isinstance(source, (bytes, bytearray)):
+        # In-memory upload: sniff the image type from its header (Image.open doesn't decode pixels)
+        mime_type = Image.MIME.get(Image.open(io.BytesIO(source)).format, "image/png")
+        # Fresh stream per attempt: a retry after a 429 must not reuse an already-read BytesIO
+        uploaded = _gemini_call(lambda: genai.upload_file(path=io.BytesIO(source), mime_type=mime_type))
+    else:
+        uploaded = _gemini_call(genai.upload_file, path=source)
+
+    with _UPLOAD_LOCK:
+        index = _load_index()
+        index[digest] = {"name": uploaded.name, "uri": uploaded.uri, "expires": time.time() + GEMINI_FILE_TTL}
+        os.makedirs(GEMINI_CACHE_DIR, exist_ok=True)
+        _write_atomic(index_path, orjson.dumps(index))
+    return uploaded
+
+def _api_backoff(attempt):
+    """Exponential backoff with jitter for rate-limited API calls, capped at a minute"""
+    return min(60, 2 ** attempt + random.random())
+
+def _gemini_call(fn, *args, **kwargs):
+    """Run a Gemini API call inside a GEMINI_CONCURRENCY slot, backing off on 429 (ResourceExhausted)"""
+    with _GEMINI_SEM:
+        for attempt in range(API_MAX_RETRIES + 1):
+            try:
+                return fn(*args, **kwargs)
+            except google_exceptions.ResourceExhausted:
+                if attempt == API_MAX_RETRIES:
+                    raise
+                wait = _api_backoff(attempt)
+                print(f"WARNING: Gemini rate limited; retrying in {wait:.1f}s")
+                time.sleep(wait)
+
+_JSON_FENCE = re.compile(r"```(?:json)?")
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+
 def clean_json(text: str):
-    text = re.sub(r"```json|```", "", text).strip()
-    return json.loads(text)
+    text = _JSON_FENCE.sub("", text).strip()
+    try:
+        return orjson.loads(text)
+    except orjson.JSONDecodeError:
+        # Gemini sometimes leaves a trailing comma; retry once without them before failing the run
+        return orjson.loads(_TRAILING_COMMA.sub(r"\1", text))
 
 # =====================================
 # IMAGE -> BLUR BACKGROUND 9:16
 # =====================================
 
-def convert_to_vertical_safe(image_path, output_path):
+def convert_to_vertical_safe(image_path, output_path=None):
+    # image_path may be a path, raw bytes or a file object.
+    # With output_path=None the PNG is returned as bytes and never touches the disk.
+    on_disk = isinstance(image_path, str) and output_path is not None
+
+    # Re-runs with an unchanged source (and target size) reuse the previous output
+    if on_disk:
+        st = os.stat(image_path)
+        meta_path = f"{output_path}.meta"
+        cache_key = f"{st.st_mtime_ns}:{st.st_size}:{TARGET_W}x{TARGET_H}"
+        if os.path.exists(output_path):
+            try:
+                with open(meta_path, "r", encoding="utf-8") as f:
+                    if f.read() == cache_key:
+                        return output_path
+            except OSError:
+                pass
+
+    if isinstance(image_path, (bytes, bytearray)):
+        image_path = io.BytesIO(image_path)
     img = Image.open(image_path).convert("RGB")
     w, h = img.size
 
-    bg = img.resize((TARGET_W, TARGET_H), Image.LANCZOS)
-    bg = bg.filter(ImageFilter.GaussianBlur(30))
+    # Blur a 1/4-scale copy and scale it back up: same look as GaussianBlur(30) at full size,
+    # on 1/16 of the pixels. Two box passes approximate the Gaussian for much less work.
+    small = img.resize((TARGET_W // BG_BLUR_SCALE, TARGET_H // BG_BLUR_SCALE), Image.BOX)
+    small = small.filter(ImageFilter.BoxBlur(BG_BOX_RADIUS)).filter(ImageFilter.BoxBlur(BG_BOX_RADIUS))
+    bg = small.resize((TARGET_W, TARGET_H), Image.BILINEAR)
 
     scale = min(TARGET_W / w, TARGET_H / h)
     fg = img.resize((int(w * scale), int(h * scale)), Image.LANCZOS)
@@ -87,7 +482,16 @@ def convert_to_vertical_safe(image_path, output_path):
     y = (TARGET_H - fg.height) // 2
 
     bg.paste(fg, (x, y))
-    bg.save(output_path)
+
+    if output_path is None:
+        buf = io.BytesIO()
+        bg.save(buf, format="PNG")
+        return buf.getvalue()
+
+    bg.save(output_path, format="PNG")
+    if on_disk:
+        with open(meta_path, "w", encoding="utf-8") as f:
+            f.write(cache_key)
 
     return output_path
 
@@ -96,9 +500,9 @@ def convert_to_vertical_safe(image_path, output_path):
 # =====================================
 
 def generate_scene_prompts_from_gemini(image_paths_dict):
+    # Values may be file paths or raw image bytes
     # Sort by key to ensure order if needed, though gemini takes list
     sorted_keys = sorted(image_paths_dict.keys())
-    images = [Image.open(image_paths_dict[k]) for k in sorted_keys]
 
     prompt = """
 You are an elite cinematic advertisement director and AI video engineer.
@@ -130,23 +534,30 @@ Return STRICT JSON ONLY:
 }
 """
 
+    key = _gemini_cache_key(prompt, [image_paths_dict[k] for k in sorted_keys])
+    cached = _cache_load("scenes", key)
+    if cached is not None:
+        return cached
+
+    # File handles instead of inline PIL images: no in-process re-encode, and the media is reusable server-side
+    with ThreadPoolExecutor(max_workers=len(sorted_keys) or 1) as ex:
+        images = list(ex.map(upload_file_cached, [image_paths_dict[k] for k in sorted_keys]))
+
     print("AI: Asking Gemini to design scenes...")
-    resp = model.generate_content([prompt] + images)
-    return clean_json(resp.text)
+    resp = _gemini_call(model.generate_content, [prompt] + images)
+    scenes = clean_json(resp.text)
+    _cache_store("scenes", key, scenes)
+    return scenes
 
 # =====================================
 # STEP 2 - DEAPI VIDEO GENERATION
 # =====================================
 
-def generate_scene(prompt: str, image_path: str, out_file: str):
-
-    print(f"\nSCENE: Generating {out_file}...")
-
-    url = "https://api.deapi.ai/api/v1/client/img2video"
-    headers = {"Authorization": f"Bearer {DEAPI_KEY}"}
-    files = {"first_frame_image": open(image_path, "rb")}
+DEAPI_SUBMIT_URL = "https://api.deapi.ai/api/v1/client/img2video"
+DEAPI_STATUS_URL = "https://api.deapi.ai/api/v1/client/request-status/{}"
 
-    data = {
+def _deapi_form(prompt):
+    return {
         "prompt": prompt,
         "width": TARGET_W,
         "height": TARGET_H,
@@ -159,58 +570,156 @@ def generate_scene(prompt: str, image_path: str, out_file: str):
         "motion": "cinematic",
     }
 
-    r = requests.post(url, data=data, files=files, headers=headers)
-    j = r.json()
-
+def _deapi_request_id(j):
     if "data" not in j or "request_id" not in j.get("data", {}):
-        print(f"ERROR: DEAPI Error: {json.dumps(j, indent=2)}")
+        print(f"ERROR: DEAPI Error: {orjson.dumps(j, option=orjson.OPT_INDENT_2).decode()}")
         if "message" in j:
             raise Exception(f"DEAPI Error: {j['message']}")
         raise KeyError(f"Missing 'data' or 'request_id' in response: {j}")
+    return j["data"]["request_id"]
+
+def _poll_wait(retry_after, delay):
+    return float(retry_after) if retry_after and retry_after.isdigit() else delay
+
+def generate_scene(prompt: str, image_path: str, out_file: str):
+
+    print(f"\nSCENE: Generating {out_file}...")
+
+    headers = {"Authorization": f"Bearer {DEAPI_KEY}"}
+    data = _deapi_form(prompt)
 
-    request_id = j["data"]["request_id"]
-    status_url = f"https://api.deapi.ai/api/v1/client/request-status/{request_id}"
+    if isinstance(image_path, (bytes, bytearray)):
+        # In-memory PNG from convert_to_vertical_safe(..., None): post it straight from RAM
+        files = {"first_frame_image": ("safe.png", image_path, "image/png")}
+        r = _session().post(DEAPI_SUBMIT_URL, data=data, files=files, headers=headers, timeout=60)
+    else:
+        with open(image_path, "rb") as fp:
+            files = {"first_frame_image": (os.path.basename(image_path), fp, "image/png")}
+            r = _session().post(DEAPI_SUBMIT_URL, data=data, files=files, headers=headers, timeout=60)
+
+    status_url = DEAPI_STATUS_URL.format(_deapi_request_id(orjson.loads(r.content)))
+
+    # Back off while the render sits idle, tighten again whenever progress moves
+    delay = POLL_MIN_DELAY
+    last_progress = -1
 
     while True:
-        res = requests.get(status_url, headers=headers).json()
+        r = _session().get(status_url, headers=headers)
+        res = orjson.loads(r.content)
         progress = res["data"].get("progress", 0)
         show_progress_bar(progress)
 
         if progress >= 100:
             video_url = res["data"]["result_url"]
-            with open(out_file, "wb") as f:
-                f.write(requests.get(video_url).content)
+            with _session().get(video_url, stream=True) as dl, open(out_file, "wb") as f:
+                dl.raise_for_status()
+                for chunk in dl.iter_content(chunk_size=1 << 20):
+                    f.write(chunk)
             print("\nSUCCESS: Saved:", out_file)
             return
 
-        time.sleep(2)
+        if progress > last_progress:
+            delay = POLL_MIN_DELAY
+            last_progress = progress
+
+        time.sleep(_poll_wait(r.headers.get("Retry-After"), delay))
+        delay = min(delay * 1.5, POLL_MAX_DELAY)
+
+async def generate_scene_async(session, prompt: str, image_path: str, out_file: str):
+    """Same flow as generate_scene, but polls with await so one event loop can drive every scene"""
+
+    print(f"\nSCENE: Generating {out_file}...")
+
+    headers = {"Authorization": f"Bearer {DEAPI_KEY}"}
+
+    form = aiohttp.FormData()
+    for k, v in _deapi_form(prompt).items():
+        form.add_field(k, str(v))
+    if isinstance(image_path, (bytes, bytearray)):
+        form.add_field("first_frame_image", bytes(image_path),
+                       filename="safe.png", content_type="image/png")
+    else:
+        with open(image_path, "rb") as fp:
+            form.add_field("first_frame_image", fp.read(),
+                           filename=os.path.basename(image_path), content_type="image/png")
+
+    async with session.post(DEAPI_SUBMIT_URL, data=form, headers=headers) as r:
+        j = orjson.loads(await r.read())
+
+    status_url = DEAPI_STATUS_URL.format(_deapi_request_id(j))
+
+    delay = POLL_MIN_DELAY
+    last_progress = -1
+
+    while True:
+        async with session.get(status_url, headers=headers) as r:
+            res = orjson.loads(await r.read())
+            retry_after = r.headers.get("Retry-After")
+        progress = res["data"].get("progress", 0)
+        show_progress_bar(progress)
+
+        if progress >= 100:
+            video_url = res["data"]["result_url"]
+            async with session.get(video_url) as dl:
+                dl.raise_for_status()
+                with open(out_file, "wb") as f:
+                    async for chunk in dl.content.iter_chunked(1 << 20):
+                        f.write(chunk)
+            print("\nSUCCESS: Saved:", out_file)
+            return out_file
+
+        if progress > last_progress:
+            delay = POLL_MIN_DELAY
+            last_progress = progress
+
+        await asyncio.sleep(_poll_wait(retry_after, delay))
+        delay = min(delay * 1.5, POLL_MAX_DELAY)
+
+async def generate_scenes_async(jobs):
+    """Run (prompt, image_path, out_file) jobs concurrently on one keep-alive aiohttp session"""
+    limit = asyncio.Semaphore(SCENE_WORKERS)
+    connector = aiohttp.TCPConnector(limit=20, keepalive_timeout=60)
+
+    async with aiohttp.ClientSession(connector=connector) as session:
+        async def _run(i, job):
+            # Stagger submissions so the jobs don't reach DEAPI in the same instant
+            await asyncio.sleep(i * SCENE_SUBMIT_STAGGER)
+            async with limit:
+                return await generate_scene_async(session, *job)
+
+        return await asyncio.gather(*[_run(i, job) for i, job in enumerate(jobs)])
 
 # =====================================
 # STEP 3 - MERGE SCENES
 # =====================================
 
 def merge_scenes():
-    clips = [VideoFileClip(SCENE_FILES[k]) for k in SCENE_FILES]
-    final = concatenate_videoclips(clips, method="compose")
-    # Removing redundant resize since source clips are already TARGET_W x TARGET_H
-    # final = final.resize((TARGET_W, TARGET_H)) 
-    final.write_videofile(FINAL_VIDEO, fps=30, threads=8, preset='ultrafast')
+    # DEAPI clips share codec/size/fps, so the concat demuxer can stream-copy them
+    concat_videos([SCENE_FILES[k] for k in SCENE_FILES], FINAL_VIDEO)
     print("\nSUCCESS: FINAL VIDEO READY:", FINAL_VIDEO)
 
 # =====================================
 # VOICEOVER PIPELINE
 # =====================================
 
+@functools.lru_cache(maxsize=64)
+def _probe_duration(video_path, mtime_ns, size):
+    # mtime/size are only part of the cache key, so a rewritten file is probed again
+    proc = subprocess.run(
+        [FFPROBE_BINARY, "-v", "error", "-show_entries", "format=duration",
+         "-of", "default=nw=1:nk=1", video_path],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffprobe failed for {video_path}: {proc.stderr.strip()}")
+    return round(float(proc.stdout.strip()), 2)
+
 def get_video_duration(video_path):
-    clip = VideoFileClip(video_path)
-    d = clip.duration
-    clip.close()
-    return round(d, 2)
+    # Container duration from ffprobe: no frame decode, and cached across pipeline steps
+    st = os.stat(video_path)
+    return _probe_duration(video_path, st.st_mtime_ns, st.st_size)
 
 def generate_script(video_path, duration):
-    with open(video_path, "rb") as f:
-        video_bytes = f.read()
-
     # Calculate estimated words needed (approx 2.5 words per second for normal speaking pace)
     target_words = int(duration * 2.5)
     
@@ -226,99 +735,180 @@ STRICT RULES:
 - Return only formatted text.
 """
 
-    r = model.generate_content([prompt, {"mime_type": "video/mp4", "data": video_bytes}])
-    return r.text.strip()
-
-def generate_voice(script_text, output_path=None):
-    if output_path is None:
-        output_path = OUTPUT_AUDIO
-        
-    url = f"https://api.elevenlabs.io/v1/text-to-speech/{VOICE_ID}"
+    # The prompt embeds the duration, so it is part of the key
+    key = _gemini_cache_key(prompt, [video_path])
+    cached = _cache_load("script", key)
+    if cached is not None:
+        return cached
+
+    # Upload through the Files API instead of inlining the whole video in the request body
+    video_file = _gemini_call(genai.upload_file, path=video_path, mime_type="video/mp4")
+    try:
+        while video_file.state.name == "PROCESSING":
+            time.sleep(2)
+            video_file = genai.get_file(video_file.name)
+        if video_file.state.name == "FAILED":
+            raise Exception(f"Gemini file processing failed for {video_path}")
+
+        r = _gemini_call(model.generate_content, [prompt, video_file])
+    finally:
+        try:
+            genai.delete_file(video_file.name)
+        except Exception:
+            pass
+    script = r.text.strip()
+    _cache_store("script", key, script)
+    return script
+
+@contextlib.contextmanager
+def _tts_stream(script_text):
+    """Open a streaming ElevenLabs TTS response; the caller iterates the MP3 chunks as they render.
+    Holds an ELEVEN_CONCURRENCY slot until the stream is closed, so bursts queue here instead of
+    coming back as 429s."""
+    url = f"https://api.elevenlabs.io/v1/text-to-speech/{VOICE_ID}/stream"
     headers = {
         "Accept": "audio/mpeg",
         "Content-Type": "application/json",
         "xi-api-key": ELEVEN_API_KEY
     }
+    params = {
+        "optimize_streaming_latency": ELEVEN_STREAMING_LATENCY,
+        "output_format": "mp3_44100_128",
+    }
     data = {
         "text": script_text,
-        "model_id": "eleven_multilingual_v2",
+        "model_id": ELEVEN_MODEL_ID,
         "voice_settings": {"stability": 0.6, "similarity_boost": 0.7}
     }
-    resp = requests.post(url, json=data, headers=headers)
-    if resp.status_code != 200:
-        print(f"ERROR: ElevenLabs Error ({resp.status_code}): {resp.text}")
-        raise Exception(f"ElevenLabs TTS failed: {resp.text}")
-    
-    audio = resp.content
-    with open(output_path, "wb") as f:
-        f.write(audio)
-
-def make_audio_safe(audio_path, video_duration, output_path=None):
-    if output_path is None:
-        output_path = SAFE_AUDIO
-
-    audio = AudioSegment.from_mp3(audio_path)
-    if len(audio) / 1000 < video_duration:
-        audio += AudioSegment.silent(duration=int((video_duration * 1000) - len(audio)))
-    audio.export(output_path, format="mp3")
-
-def attach_audio_to_video(video_path, audio_path, output_path):
-    video = VideoFileClip(video_path)
-    audio = AudioFileClip(audio_path)
-    final = video.set_audio(audio)
-    final.write_videofile(output_path, codec="libx264", audio_codec="aac", threads=8, preset='ultrafast')
-    video.close()
-    audio.close()
-    final.close()
+    with _ELEVEN_SEM:
+        for attempt in range(API_MAX_RETRIES + 1):
+            resp = _session().post(url, json=data, headers=headers, params=params, stream=True, timeout=60)
+            if resp.status_code != 429 or attempt == API_MAX_RETRIES:
+                break
+            # Concurrency 429s clear as soon as another request finishes; system_busy needs real backoff
+            busy = "too_many_concurrent_requests" not in resp.text
+            resp.close()
+            time.sleep(_api_backoff(attempt) if busy else 0.05)
+        if resp.status_code != 200:
+            print(f"ERROR: ElevenLabs Error ({resp.status_code}): {resp.text}")
+            raise Exception(f"ElevenLabs TTS failed: {resp.text}")
+        with resp:
+            yield resp
+
+def _tts_into_ffmpeg(script_text, output_path, ffmpeg_args):
+    """Stream TTS to output_path while ffmpeg consumes the same MP3 bytes from stdin ("pipe:0"
+    in ffmpeg_args); on a cache hit ffmpeg reads the cached copy instead"""
+    key = _tts_cache_key(script_text)
+    cached = _tts_cache_get(key)
+    if cached is not None:
+        shutil.copyfile(cached, output_path)
+        run_ffmpeg([output_path if a == "pipe:0" else a for a in ffmpeg_args])
+        return
+
+    proc = subprocess.Popen(
+        [FFMPEG_BINARY, "-y", "-hide_banner", "-loglevel", "error"] + list(ffmpeg_args),
+        stdin=subprocess.PIPE, stderr=subprocess.PIPE,
+    )
+    try:
+        feeding = True
+        with _tts_stream(script_text) as resp, open(output_path, "wb") as f:
+            for chunk in resp.iter_content(chunk_size=8192):
+                f.write(chunk)
+                if feeding:
+                    try:
+                        proc.stdin.write(chunk)
+                    except OSError:
+                        # ffmpeg is done with the audio (e.g. -shortest cut it at the video's end);
+                        # keep saving the full MP3 and let its exit status decide success
+                        feeding = False
+        try:
+            proc.stdin.close()
+        except OSError:
+            pass
+        stderr = proc.stderr.read().decode(errors="replace")
+        if proc.wait() != 0:
+            raise RuntimeError(f"ffmpeg failed ({proc.returncode}): {stderr.strip()}")
+    except BaseException:
+        proc.kill()
+        proc.wait()
+        raise
+    _tts_cache_put(key, output_path)
+
+def generate_voice_attached(script_text, video_path, video_duration, output_path, audio_path=None):
+    """TTS + pad + attach_audio_to_video as one ffmpeg run: the TTS stream is padded to the video
+    length and muxed next to the copied video stream, with no intermediate padded-audio file"""
+    if audio_path is None:
+        audio_path = OUTPUT_AUDIO
+
+    _tts_into_ffmpeg(script_text, audio_path, [
+        "-i", video_path,
+        "-f", "mp3", "-i", "pipe:0",
+        "-map", "0:v:0", "-map", "1:a:0",
+        "-af", f"apad=whole_dur={video_duration}",
+        "-c:v", "copy", "-c:a", "aac",
+        "-shortest",
+        output_path,
+    ])
+
+def attach_audio_to_video(video_path, audio_path, output_path, pad_to=None):
+    # Mux only: copy the video stream untouched; re-encode audio only if it isn't AAC already,
+    # or if it's shorter than pad_to (the video length) and needs padding with silence
+    if pad_to is not None and get_video_duration(audio_path) < pad_to:
+        audio_args = ["-af", f"apad=whole_dur={pad_to}", "-c:a", "aac"]
+    elif probe_audio_codec(audio_path) == "aac":
+        audio_args = ["-c:a", "copy"]
+    else:
+        audio_args = ["-c:a", "aac"]
+    run_ffmpeg([
+        "-i", video_path,
+        "-i", audio_path,
+        "-map", "0:v:0", "-map", "1:a:0",
+        "-c:v", "copy", *audio_args,
+        "-shortest",
+        output_path,
+    ])
 
 # =====================================
 # WHISPER -> INSTAGRAM STYLE SRT
 # =====================================
 
+def format_srt_time(t):
+    # One multiply, then integer divmods on milliseconds
+    ms = int(t * 1000)
+    h, ms = divmod(ms, 3_600_000)
+    m, ms = divmod(ms, 60_000)
+    s, ms = divmod(ms, 1000)
+    return f"{h:02}:{m:02}:{s:02},{ms:03}"
+
 def generate_instagram_srt_from_video(video_path, output_srt, max_words=3):
 
     print("\nINFO: Generating Instagram-style captions using Whisper...")
 
-    model = whisper.load_model(WHISPER_MODEL_SIZE)
+    whisper_model = _get_whisper()
 
-    result = model.transcribe(
-        video_path,
+    segments, _info = whisper_model.transcribe(
+        load_audio_16k(video_path),
         word_timestamps=True,
-        verbose=False
+        vad_filter=WHISPER_VAD
     )
 
-    def format_time(t):
-        h = int(t // 3600)
-        m = int((t % 3600) // 60)
-        s = int(t % 60)
-        ms = int((t - int(t)) * 1000)
-        return f"{h:02}:{m:02}:{s:02},{ms:03}"
-
-    index = 1
-    srt_lines = []
-
-    for segment in result["segments"]:
-        words = segment.get("words", [])
-        i = 0
-
-        while i < len(words):
-            chunk = words[i:i + max_words]
-
-            start = chunk[0]["start"]
-            end = chunk[-1]["end"]
-            text = " ".join(w["word"].strip() for w in chunk)
+    # segments is a lazy generator: write each caption as soon as its segment is decoded
+    index = 0
+    with open(output_srt, "w", encoding="utf-8") as f:
+        for segment in segments:
+            # Strip each word once up front; chunks never cross a segment boundary
+            words = [(w.start, w.end, w.word.strip()) for w in segment.words or []]
 
-            srt_lines.append(
-                f"{index}\n"
-                f"{format_time(start)} --> {format_time(end)}\n"
-                f"{text}\n"
-            )
+            for i in range(0, len(words), max_words):
+                chunk = words[i:i + max_words]
+                text = " ".join(w[2] for w in chunk)
 
-            index += 1
-            i += max_words
-
-    with open(output_srt, "w", encoding="utf-8") as f:
-        f.write("\n".join(srt_lines))
+                index += 1
+                f.write(
+                    f"{index}\n"
+                    f"{format_srt_time(chunk[0][0])} --> {format_srt_time(chunk[-1][1])}\n"
+                    f"{text}\n\n"
+                )
 
     print("SUCCESS: PERFECTLY SYNCED Instagram SRT created:", output_srt)
 
@@ -330,11 +920,15 @@ def main():
 
     scenes = generate_scene_prompts_from_gemini(SCENE_IMAGES)
 
-    for key in scenes:
-        safe_img = f"safe_{key}.png"
-        convert_to_vertical_safe(SCENE_IMAGES[key], safe_img)
-        generate_scene(scenes[key], safe_img, SCENE_FILES[key])
-        time.sleep(20)
+    # Pillow releases the GIL in resize/filter, so the four conversions run in parallel
+    safe_images = {key: f"safe_{key}.png" for key in scenes}
+    with ThreadPoolExecutor(max_workers=len(safe_images) or 1) as ex:
+        list(ex.map(lambda k: convert_to_vertical_safe(SCENE_IMAGES[k], safe_images[k]), safe_images))
+
+    # Scene generation is almost entirely DEAPI polling, so one event loop drives all scenes
+    asyncio.run(generate_scenes_async(
+        [(scenes[key], safe_images[key], SCENE_FILES[key]) for key in scenes]
+    ))
 
     merge_scenes()
 
@@ -350,9 +944,7 @@ def main():
             script = generate_script(FINAL_VIDEO, dur)
             print("\nSCRIPT:\n", script)
 
-            generate_voice(script)
-            make_audio_safe(OUTPUT_AUDIO, dur)
-            attach_audio_to_video(FINAL_VIDEO, SAFE_AUDIO, FINAL_VIDEO_WITH_VOICE)
+            generate_voice_attached(script, FINAL_VIDEO, dur, FINAL_VIDEO_WITH_VOICE)
 
             print("\nSUCCESS: FINAL VIDEO WITH VOICE READY:", FINAL_VIDEO_WITH_VOICE)
 
@@ -1,42 +1,47 @@
-import os
-import sys
-
-# =====================================
-# CRITICAL CONFIGURATION: MUST RUN BEFORE IMPORTS
-# =====================================
-# Configure ImageMagick path based on OS logic
-# This must happen before 'moviepy' is imported, otherwise it reads the wrong config/env
-if os.name == 'posix': # Linux / Render / Docker
-    os.environ['IMAGEMAGICK_BINARY'] = '/usr/bin/magick'
-    print("CONFIG: Set ImageMagick path to /usr/bin/magick")
-
-from flask import Flask, request, jsonify, send_file, redirect, url_for, render_template, flash
+from flask import Flask, Response, request, jsonify, send_file, redirect, url_for, render_template, flash
 from flask_cors import CORS
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
 from flask_bcrypt import Bcrypt
-from pymongo import MongoClient
+from pymongo import MongoClient, DESCENDING
 from bson.objectid import ObjectId
 import os
 from dotenv import load_dotenv
 import sys
 import importlib.util
-from moviepy.editor import VideoFileClip, concatenate_videoclips
-import requests
 import time
 import json
 import random
-import datetime
-import traceback
-
-from services import scene_service, audio_service, caption_service
-
-# Load environment variables
+import logging
+from logging.handlers import RotatingFileHandler
+import functools
+from urllib.parse import urlencode
+import tempfile
+import threading
+
+# Load environment variables (before the services, which read CAPTION_* etc. at import)
 load_dotenv()
 
+from services import scene_service, audio_service, caption_service, task_service
+
+# Logging: one configured logger instead of prints, so production can run at LOG_LEVEL=WARNING
+# and skip message formatting entirely. Set LOG_FILE to also write a rotating log file.
+logger = logging.getLogger("app")
+logger.setLevel(os.getenv('LOG_LEVEL', 'INFO').upper())
+_log_formatter = logging.Formatter("[%(asctime)s] %(message)s", datefmt="%I:%M:%S %p")
+_log_handlers = [logging.StreamHandler()]
+if os.getenv('LOG_FILE'):
+    _log_handlers.append(RotatingFileHandler(os.getenv('LOG_FILE'), maxBytes=10 * 1024 * 1024, backupCount=3))
+for _handler in _log_handlers:
+    _handler.setFormatter(_log_formatter)
+    logger.addHandler(_handler)
+logger.propagate = False
+
 app = Flask(__name__, static_folder='static', template_folder='templates')
 CORS(app)
 bcrypt = Bcrypt(app)
 app.secret_key = os.getenv('SECRET_KEY', 'supersecretkey')
+# Reject oversized uploads up front (scene images are a few MB at most)
+app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_UPLOAD_MB', 64)) * 1024 * 1024
 
 import certifi
 
@@ -45,24 +50,53 @@ mongo_uri = os.getenv('MONGO_URI', 'mongodb://localhost:27017/')
 try:
     # Set serverSelectionTimeoutMS to 5 seconds to avoid long hangs on startup
     # We use certifi to provide a reliable set of root CA certificates
+    # Pool sized for gunicorn's 8 threads plus background tasks; zlib wire compression is
+    # built into PyMongo (snappy/zstd would need extra packages)
     client = MongoClient(
         mongo_uri, 
         serverSelectionTimeoutMS=5000,
-        tlsCAFile=certifi.where()
+        tlsCAFile=certifi.where(),
+        maxPoolSize=int(os.getenv('MONGO_MAX_POOL_SIZE', 50)),
+        minPoolSize=int(os.getenv('MONGO_MIN_POOL_SIZE', 2)),
+        compressors="zlib",
+        retryReads=True,
+        retryWrites=True
     )
     # The 'ping' command checks if we can actually reach the server
     client.admin.command('ping')
-    print("SUCCESS: MongoDB connected successfully!")
+    logger.info("SUCCESS: MongoDB connected successfully!")
 except Exception as e:
-    print(f"WARNING: MongoDB Connection Warning: {e}")
+    logger.warning("WARNING: MongoDB Connection Warning: %s", e)
     if "SSL handshake failed" in str(e) or "TLSV1_ALERT_INTERNAL_ERROR" in str(e):
-        print("TIP: This error usually means your IP is not whitelisted in MongoDB Atlas.")
-        print("   Please ensure your current IP is added to 'Network Access' in the Atlas dashboard.")
-    print("The app will start, but Login/Signup features will not work.")
+        logger.warning("TIP: This error usually means your IP is not whitelisted in MongoDB Atlas. "
+                       "Please ensure your current IP is added to 'Network Access' in the Atlas dashboard.")
+    logger.warning("The app will start, but Login/Signup features will not work.")
 
 db = client['video_gen_db']
 users_collection = db['users']
 
+# Leaderboard reads walk this index instead of scanning and sorting the whole collection
+LEADERBOARD_LIMIT = int(os.getenv('LEADERBOARD_LIMIT', 100))
+try:
+    users_collection.create_index([("video_count", DESCENDING)], background=True)
+except Exception as e:
+    logger.warning("WARNING: Could not create leaderboard index: %s", e)
+
+# One-time backfill of video_count for users created before the counter existed.
+# Guarded by a flag in _meta so later boots skip the collection scan entirely.
+try:
+    meta_collection = db['_meta']
+    if not meta_collection.find_one({"_id": "video_count_backfill"}):
+        result = users_collection.update_many({"video_count": {"$exists": False}}, {"$set": {"video_count": 0}})
+        meta_collection.update_one(
+            {"_id": "video_count_backfill"},
+            {"$set": {"done": True, "migrated": result.modified_count}},
+            upsert=True
+        )
+        logger.info("MIGRATION: Backfilled video_count for %d users", result.modified_count)
+except Exception as e:
+    logger.warning("WARNING: Could not backfill video_count: %s", e)
+
 # Flask-Login Setup
 login_manager = LoginManager()
 login_manager.init_app(app)
@@ -111,6 +145,7 @@ def signup():
         "password": hashed_password,
         "video_count": 0
     })
+    invalidate_leaderboard_cache()
     
     if not request.is_json:
         flash("Account created! You can now sign in.", "success")
@@ -180,7 +215,7 @@ def rotate_api_key():
         current_key_index = (current_key_index + 1) % len(DEAPI_KEYS_LIST)
         new_key = DEAPI_KEYS_LIST[current_key_index]
         main_module.DEAPI_KEY = new_key
-        print(f"ROTATE: Switched to DEAPI Key #{current_key_index + 1}: {new_key[:10]}...")
+        logger.info("ROTATE: Switched to DEAPI Key #%d: %s...", current_key_index + 1, new_key[:10])
         return True
     return False
 
@@ -211,53 +246,103 @@ main_module.TARGET_W = int(os.getenv('TARGET_WIDTH', 432))
 main_module.TARGET_H = int(os.getenv('TARGET_HEIGHT', 768))
 main_module.VOICE_ID = os.getenv('VOICE_ID', '21m00Tcm4TlvDq8ikWAM')
 main_module.OUTPUT_AUDIO = os.getenv('OUTPUT_AUDIO', 'final_voice.mp3')
-main_module.SAFE_AUDIO = os.getenv('SAFE_AUDIO', 'final_voice_safe.mp3')
 main_module.SRT_OUTPUT = os.getenv('SRT_OUTPUT', 'ainsta_caption.srt')
 main_module.MAX_WORDS = int(os.getenv('MAX_WORDS_PER_CAPTION', 3))
 main_module.WHISPER_MODEL_SIZE = os.getenv('WHISPER_MODEL_SIZE', 'small')
+main_module.WHISPER_COMPUTE_TYPE = os.getenv('WHISPER_COMPUTE_TYPE', main_module.WHISPER_COMPUTE_TYPE)
 
 main_module.model = main_module.genai.GenerativeModel(os.getenv('GEMINI_MODEL', 'gemini-2.5-flash'))
 
-# Configure ImageMagick path based on OS
-if os.name == 'posix': # Linux / Render / Docker
-    default_im_path = '/usr/bin/magick'
-else: # Windows (Local Dev)
-    default_im_path = r'C:\Program Files\ImageMagick-7.1.1-Q16-HDRI\magick.exe'
+# Warm Whisper once at boot (after WHISPER_MODEL_SIZE is set) so no request pays the model load.
+# Runs in the serving process on a background thread: CTranslate2's inference threads (and CUDA)
+# don't survive fork(), so the model must never be built in a gunicorn --preload master.
+if os.getenv('PRELOAD_WHISPER', '1') == '1':
+    threading.Thread(target=main_module._get_whisper, name="whisper-warmup", daemon=True).start()
+
+def log_step(msg, label="INFO", *args):
+    """Log a labelled pipeline step; pass args for lazy %-formatting of msg"""
+    level = logging.ERROR if label == "ERROR" else logging.INFO
+    if args:
+        logger.log(level, "%s " + msg, label, *args)
+    else:
+        logger.log(level, "%s %s", label, msg)
+
+# =====================================
+# HELPER: Background tasks
+# =====================================
+
+def background_capable(view):
+    """
+    Let a long-running endpoint run in the task pool when called with ?async=1.
+    The request body is captured and the view is replayed in a fresh request context on a
+    worker thread, so the Flask worker is freed immediately. Returns 202 with a task_id
+    to poll at /api/task/<task_id>; without ?async=1 the endpoint behaves as before.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.args.get('async') != '1':
+            return view(*args, **kwargs)
+
+        body = request.get_data()
+        query = urlencode([(k, v) for k, v in request.args.items(multi=True) if k != 'async'])
+        ctx_kwargs = dict(
+            path=request.path,
+            method=request.method,
+            headers=list(request.headers.items()),
+            data=body,
+            query_string=query,
+        )
+
+        def run():
+            with app.test_request_context(**ctx_kwargs):
+                response = app.make_response(view(*args, **kwargs))
+                return {"status_code": response.status_code, "response": response.get_json(silent=True)}
 
-imagemagick_path = os.getenv('IMAGEMAGICK_BINARY', default_im_path)
-caption_module.change_settings({
-    "IMAGEMAGICK_BINARY": imagemagick_path
-})
+        task_id = task_service.submit(run, owner=current_user.get_id(), name=view.__name__)
+        return jsonify({
+            "success": True,
+            "task_id": task_id,
+            "status_url": url_for('get_task', task_id=task_id),
+        }), 202
 
-def log_step(msg, label="INFO"):
-    """Helper to print timestamped logs with labels"""
-    now = datetime.datetime.now().strftime("%I:%M:%S %p")
-    print(f"[{now}] {label} {msg}")
+    return wrapper
 
 # =====================================
 # HELPER: Enhanced generate_scene with better error handling
 # =====================================
 
+# Cap on DEAPI jobs in flight from this process, so parallel scenes don't trigger a 429 storm
+DEAPI_MAX_CONCURRENCY = int(os.getenv('DEAPI_MAX_CONCURRENCY', 4))
+_deapi_sem = threading.BoundedSemaphore(DEAPI_MAX_CONCURRENCY)
+RETRY_MAX_WAIT = 120
+
+def _backoff_delay(retry_delay, attempt):
+    """Exponential backoff with full jitter on top, capped at RETRY_MAX_WAIT"""
+    return min(RETRY_MAX_WAIT, retry_delay * (2 ** attempt) + random.uniform(0, retry_delay))
+
 def generate_scene_with_retry(prompt, image_path, out_file, max_retries=3, retry_delay=20):
     """
     Wrapper around generate_scene with retry logic and API key rotation
     """
-    log_step(f"Initializing generation for: {out_file}", "START")
+    log_step("Initializing generation for: %s", "START", out_file)
     for attempt in range(max_retries):
         try:
-            log_step(f"Attempt {attempt + 1}/{max_retries}: Requesting DEAPI...", "REQUEST")
+            log_step("Attempt %s/%s: Requesting DEAPI...", "REQUEST", attempt + 1, max_retries)
             # Try to generate the scene using the robust main_module logic
-            main_module.generate_scene(prompt, image_path, out_file)
-            log_step(f"Success: Scene created at {out_file}", "SUCCESS")
+            with _deapi_sem:
+                main_module.generate_scene(prompt, image_path, out_file)
+            log_step("Success: Scene created at %s", "SUCCESS", out_file)
             return True, None
         except Exception as e:
             error_msg = str(e)
-            log_step(f"Error (Attempt {attempt + 1}): {error_msg}", "ERROR")
+            log_step("Error (Attempt %s): %s", "ERROR", attempt + 1, error_msg)
             
             # Handle rate limiting specifically
             if "Too Many Attempts" in error_msg or "429" in error_msg:
-                wait_time = retry_delay * (attempt + 1)
-                log_step(f"Rate limited (429). Waiting {wait_time}s...", "WAIT")
+                if attempt == max_retries - 1:
+                    break
+                wait_time = _backoff_delay(retry_delay, attempt)
+                log_step("Rate limited (429). Waiting %.1fs...", "WAIT", wait_time)
                 time.sleep(wait_time)
                 if rotate_api_key():
                     log_step("API Key rotated. Retrying...", "ROTATE")
@@ -268,12 +353,12 @@ def generate_scene_with_retry(prompt, image_path, out_file, max_retries=3, retry
                 if rotate_api_key():
                     log_step("Error encountered. Rotating API Key for retry...", "ROTATE")
                 else:
-                    wait_time = retry_delay * (attempt + 1)
-                    log_step(f"Waiting {wait_time}s before retry...", "WAIT")
+                    wait_time = _backoff_delay(retry_delay, attempt)
+                    log_step("Waiting %.1fs before retry...", "WAIT", wait_time)
                     time.sleep(wait_time)
                 continue
             else:
-                log_step(f"Final Failure: All {max_retries} attempts exhausted.", "FAILURE")
+                log_step("Final Failure: All %s attempts exhausted.", "FAILURE", max_retries)
                 return False, error_msg
     
     return False, f"Failed after {max_retries} attempts"
@@ -301,14 +386,7 @@ def signup_page():
 @app.route('/leaderboard')
 @login_required
 def leaderboard_page():
-    # Fetch leaderboard data from MongoDB
-    users_data = list(users_collection.find({}, {"username": 1, "video_count": 1, "_id": 0}))
-    for user in users_data:
-        if 'video_count' not in user:
-            user['video_count'] = 0
-            
-    # Use the requested DSA Merge Sort for college project requirement
-    leaderboard_sorted = merge_sort_leaderboard(users_data)
+    leaderboard_sorted = fetch_leaderboard()
     return render_template('leaderboard.html', leaderboard=leaderboard_sorted)
 
 
@@ -320,9 +398,7 @@ def health():
 @login_required
 def generate_scene_prompts():
     """Generate scene prompts from Gemini using uploaded images"""
-    print("\n" + "="*50)
     log_step("STEP 1: ANALYZING IMAGES & GENERATING PROMPTS", "PROMPTS")
-    print("="*50)
     try:
         # Check if images are provided in request
         if 'scene1' not in request.files or 'scene2' not in request.files or \
@@ -330,41 +406,25 @@ def generate_scene_prompts():
             log_step("Input Error: Missing one or more scene images.", "ERROR")
             return jsonify({"error": "Please upload 4 images (scene1, scene2, scene3, scene4)"}), 400
         
-        # Save uploaded images temporarily
+        # Keep uploaded images in memory; Gemini only needs the bytes
         temp_images = {}
         for scene in ['scene1', 'scene2', 'scene3', 'scene4']:
-            file = request.files[scene]
-            temp_path = f"temp_{scene}.png"
-            file.save(temp_path)
-            temp_images[scene] = temp_path
-            log_step(f"Saved temporary image for {scene}: {temp_path}", "IMAGE")
+            temp_images[scene] = request.files[scene].read()
+            log_step("Read uploaded image for %s (%s bytes)", "IMAGE", scene, len(temp_images[scene]))
         
-        # Generate prompts using scene_service
-        log_step("Sending images to Gemini for prompt generation...", "AI")
         # Generate prompts using scene_service
         log_step("Sending images to Gemini for prompt generation...", "AI")
         scenes = scene_service.generate_scene_prompts(main_module, temp_images)
-        log_step(f"Prompts generated successfully: {list(scenes.keys())}", "SUCCESS")
-        
-        # Clean up temp files
-        for path in temp_images.values():
-            if os.path.exists(path):
-                os.remove(path)
+        log_step("Prompts generated successfully: %s", "SUCCESS", list(scenes.keys()))
         
         return jsonify({"success": True, "scenes": scenes})
     except Exception as e:
-        print(f"\n{'='*50}")
-        print(f"ERROR: Exception in generate_scene_prompts")
-        print(f"{'='*50}")
-        print(f"Error Type: {type(e).__name__}")
-        print(f"Error Message: {str(e)}")
-        print(f"\nFull Traceback:")
-        traceback.print_exc()
-        print(f"{'='*50}\n")
+        logger.exception("ERROR: Exception in generate_scene_prompts")
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/generate-scene', methods=['POST'])
 @login_required
+@background_capable
 def generate_scene():
     """Generate a single scene video"""
     try:
@@ -378,149 +438,107 @@ def generate_scene():
         prompt = data.get('prompt')
         
         if not scene_key or not prompt:
-            log_step(f"Input Error: Missing key ({scene_key}) or prompt ({prompt[:20]})", "ERROR")
+            log_step("Input Error: Missing key (%s) or prompt (%s)", "ERROR", scene_key, prompt and prompt[:20])
             return jsonify({"error": "scene_key and prompt are required"}), 400
         
-        print("\n" + "-"*40)
-        log_step(f"STEP 2-5: GENERATING SCENE: {scene_key.upper()}", "SCENE")
-        log_step(f"Prompt: {prompt[:100]}...", "PROMPT")
-        print("-"*40)
-        
-        # Handle image upload
-        image_path = None
-        if scene_key in request.files:
-            file = request.files[scene_key]
-            image_path = f"temp_{scene_key}_input.png"
-            file.save(image_path)
-            log_step(f"Using uploaded image for {scene_key}", "UPLOAD")
-        elif scene_key in main_module.SCENE_IMAGES:
-            image_path = main_module.SCENE_IMAGES[scene_key]
-            log_step(f"Using default image path for {scene_key}: {image_path}", "IMAGE")
-        else:
-            log_step(f"Image for {scene_key} not found", "ERROR")
-            return jsonify({"error": f"Image for {scene_key} not found"}), 400
-        
-        # Convert to vertical safe
-        safe_img = f"safe_{scene_key}.png"
-        log_step(f"Converting {scene_key} image to 9:16 safe format...", "CONVERT")
-        main_module.convert_to_vertical_safe(image_path, safe_img)
-        
-        # Define output file path
-        output_file = main_module.SCENE_FILES.get(scene_key, f"{scene_key}.mp4")
-        
-        # Generate scene using retry/rotation logic
-        log_step(f"Sending request to DEAPI for {scene_key}...", "API")
-        # Custom infinite retry setting
-        success_result = scene_service.generate_single_scene(
-            main_module,
-            scene_key,
-            prompt,
-            safe_img,
-            output_file,
-            generate_scene_with_retry
-        )
-        
+        log_step("STEP 2-5: GENERATING SCENE: %s", "SCENE", scene_key.upper())
+        log_step("Prompt: %s...", "PROMPT", prompt[:100])
+        
+        # Per-request scratch dir: unique across concurrent requests and removed even on errors
+        with tempfile.TemporaryDirectory(prefix="gen_") as td:
+            # Handle image upload
+            if scene_key in request.files:
+                # Keep the upload in memory; it is converted and posted to DEAPI without touching disk
+                image_path = request.files[scene_key].read()
+                log_step("Using uploaded image for %s (%s bytes)", "UPLOAD", scene_key, len(image_path))
+            elif scene_key in main_module.SCENE_IMAGES:
+                image_path = main_module.SCENE_IMAGES[scene_key]
+                log_step("Using default image path for %s: %s", "IMAGE", scene_key, image_path)
+            else:
+                log_step("Image for %s not found", "ERROR", scene_key)
+                return jsonify({"error": f"Image for {scene_key} not found"}), 400
+
+            # Define output file path
+            output_file = main_module.SCENE_FILES.get(scene_key, f"{scene_key}.mp4")
+
+            # Convert to 9:16 safe format and generate scene using retry/rotation logic
+            log_step("Converting %s image and sending request to DEAPI...", "API", scene_key)
+            success_result = scene_service.generate_single_scene(
+                main_module,
+                scene_key,
+                prompt,
+                image_path,
+                output_file,
+                generate_scene_with_retry,
+                work_dir=td,
+            )
+
         # Check dictionary result
-        if success_result.get("status") == "success":
-             log_step(f"Scene {scene_key} generated successfully: {output_file}", "SUCCESS")
-        else:
-             error_msg = success_result.get("error", "Unknown error")
-             log_step(f"Scene {scene_key} generation failed: {error_msg}", "ERROR")
-             return jsonify({"error": f"Error generating scene: {error_msg}"}), 500
-
-        # Legacy cleanup logic from original app.py needs to be preserved or adapted
-        if image_path and "temp_" in image_path and os.path.exists(image_path):
-            os.remove(image_path)
-        if safe_img and os.path.exists(safe_img):
-            os.remove(safe_img)
-            
-        return jsonify({"success": True, "output_file": output_file})
-        
-        if not success:
-            log_step(f"Scene {scene_key} generation failed: {error_msg}", "ERROR")
-            if image_path and "temp_" in image_path and os.path.exists(image_path):
-                os.remove(image_path)
+        if success_result.get("status") != "success":
+            error_msg = success_result.get("error", "Unknown error")
+            log_step("Scene %s generation failed: %s", "ERROR", scene_key, error_msg)
             return jsonify({"error": f"Error generating scene: {error_msg}"}), 500
-        
-        log_step(f"Scene {scene_key} generated successfully: {output_file}", "SUCCESS")
-        
-        # Cleanup temp image/safe image after success if they were temporary
-        if image_path and "temp_" in image_path and os.path.exists(image_path):
-            os.remove(image_path)
-        if safe_img and os.path.exists(safe_img):
-            os.remove(safe_img)
-            
+
+        log_step("Scene %s generated successfully: %s", "SUCCESS", scene_key, output_file)
         return jsonify({"success": True, "output_file": output_file})
     except Exception as e:
-        print(f"\n{'='*50}")
-        print(f"ERROR: Exception in generate_scene")
-        print(f"{'='*50}")
-        traceback.print_exc()
-        print(f"{'='*50}\n")
+        logger.exception("ERROR: Exception in generate_scene")
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/generate-all-scenes', methods=['POST'])
 @login_required
+@background_capable
 def generate_all_scenes():
     """Generate all 4 scenes"""
     try:
         # Get scene prompts (either from request or generate from images)
         scenes = None
-        temp_images = {}
-        
+
         if request.is_json and request.json and 'scenes' in request.json:
             scenes = request.json['scenes']
         elif 'scenes' in request.form:
-            import json
             scenes = json.loads(request.form['scenes'])
-        
-        if not scenes:
-            # Generate prompts from uploaded images
-            if 'scene1' not in request.files:
-                return jsonify({"error": "Please provide scenes JSON or upload 4 images"}), 400
-            
-            for scene in ['scene1', 'scene2', 'scene3', 'scene4']:
-                file = request.files[scene]
-                temp_path = f"temp_{scene}.png"
-                file.save(temp_path)
-                temp_images[scene] = temp_path
-            
-            scenes = scene_service.generate_scene_prompts(main_module, temp_images)
-        else:
-            # If scenes provided but need images from upload
-            for scene in ['scene1', 'scene2', 'scene3', 'scene4']:
-                if scene in request.files:
-                    file = request.files[scene]
-                    temp_path = f"temp_{scene}.png"
-                    file.save(temp_path)
-                    temp_images[scene] = temp_path
-                else:
-                    # Use default image path
-                    temp_images[scene] = main_module.SCENE_IMAGES.get(scene)
-        
+
+        if not scenes and 'scene1' not in request.files:
+            return jsonify({"error": "Please provide scenes JSON or upload 4 images"}), 400
+
         # Define output files dict
         output_files = {}
         for k in ['scene1', 'scene2', 'scene3', 'scene4']:
             output_files[k] = main_module.SCENE_FILES.get(k, f"{k}.mp4")
 
-        # Generate all scenes using scene_service
-        results = scene_service.generate_all_scenes(
-            main_module,
-            scenes,
-            temp_images,
-            output_files,
-            generate_scene_with_retry,
-            required_scenes=['scene1', 'scene2', 'scene3', 'scene4']
-        )
-        
+        # Per-request scratch dir: unique across concurrent requests and removed even on errors
+        with tempfile.TemporaryDirectory(prefix="gen_") as td:
+            # Uploads stay in memory for both Gemini and DEAPI; td only holds safe copies of default images
+            temp_images = {
+                scene: request.files[scene].read()
+                for scene in ['scene1', 'scene2', 'scene3', 'scene4']
+                if scene in request.files
+            }
+
+            if not scenes:
+                # Generate prompts from uploaded images
+                scenes = scene_service.generate_scene_prompts(main_module, temp_images)
+            else:
+                for scene in ['scene1', 'scene2', 'scene3', 'scene4']:
+                    if scene not in temp_images:
+                        # Use default image path
+                        temp_images[scene] = main_module.SCENE_IMAGES.get(scene)
+
+            # Generate all scenes using scene_service
+            results = scene_service.generate_all_scenes(
+                main_module,
+                scenes,
+                temp_images,
+                output_files,
+                generate_scene_with_retry,
+                required_scenes=['scene1', 'scene2', 'scene3', 'scene4'],
+                work_dir=td,
+            )
+
         # Check if at least one scene succeeded
         successful_scenes = [r for r in results if r.get("status") == "success"]
-        
-        # Cleanup temp images
-        for path in temp_images.values():
-            if path and os.path.exists(path):
-                os.remove(path)
-        
+
         return jsonify({
             "success": len(successful_scenes) > 0,
             "results": results,
@@ -528,26 +546,22 @@ def generate_all_scenes():
             "total_count": len(results)
         })
     except Exception as e:
-        print(f"\n{'='*50}")
-        print(f"ERROR: Exception in generate_all_scenes")
-        traceback.print_exc()
-        print(f"{'='*50}\n")
+        logger.exception("ERROR: Exception in generate_all_scenes")
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/merge-scenes', methods=['POST'])
 @login_required
+@background_capable
 def merge_scenes():
     """Merge all scene videos into final video"""
-    print("\n" + "="*50)
     log_step("STEP 6: MERGING ALL SCENES INTO REEL", "MERGE")
-    print("="*50)
     try:
         # Build scene_results format expected by scene_service
         scene_results = []
         for key in ['scene1', 'scene2', 'scene3', 'scene4']:
             scene_file = main_module.SCENE_FILES.get(key, f"{key}.mp4")
             if os.path.exists(scene_file):
-                log_step(f"Found scene video: {scene_file}", "VIDEO")
+                log_step("Found scene video: %s", "VIDEO", scene_file)
                 scene_results.append({
                     "scene": key,
                     "status": "success",
@@ -562,9 +576,9 @@ def merge_scenes():
             }), 400
         
         # Use scene_service to merge
-        log_step(f"Merging {len(scene_results)} scenes into {main_module.FINAL_VIDEO}...", "MERGE")
+        log_step("Merging %s scenes into %s...", "MERGE", len(scene_results), main_module.FINAL_VIDEO)
         final_video = scene_service.merge_scenes(main_module, scene_results, main_module.FINAL_VIDEO)
-        log_step(f"Scenes merged successfully: {final_video}", "SUCCESS")
+        log_step("Scenes merged successfully: %s", "SUCCESS", final_video)
         
         return jsonify({
             "success": True,
@@ -573,38 +587,31 @@ def merge_scenes():
             "scene_count": len(scene_results)
         })
     except ValueError as e:
-        print(f"\n{'='*50}")
-        print(f"ERROR: ValueError in merge_scenes")
-        traceback.print_exc()
-        print(f"{'='*50}\n")
+        logger.exception("ERROR: ValueError in merge_scenes")
         return jsonify({"error": str(e)}), 400
     except Exception as e:
-        print(f"\n{'='*50}")
-        print(f"ERROR: Exception in merge_scenes")
-        traceback.print_exc()
-        print(f"{'='*50}\n")
+        logger.exception("ERROR: Exception in merge_scenes")
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/generate-voiceover', methods=['POST'])
 @login_required
+@background_capable
 def generate_voiceover():
     """Generate voiceover script and audio"""
-    print("\n" + "="*50)
     log_step("STEP 7: CREATING AI VOICEOVER SCRIPT", "VOICE")
-    print("="*50)
     try:
         data = request.json if request.is_json and request.json else {}
         video_path = data.get('video_path', main_module.FINAL_VIDEO)
         
         if not os.path.exists(video_path):
-            log_step(f"Video file not found: {video_path}", "ERROR")
+            log_step("Video file not found: %s", "ERROR", video_path)
             return jsonify({"error": f"Video file not found: {video_path}"}), 400
         
         # Use audio_service to generate voiceover script
-        log_step(f"Analyzing {video_path} for script generation...", "VOICE")
+        log_step("Analyzing %s for script generation...", "VOICE", video_path)
         script_result = audio_service.generate_voiceover_script(main_module, video_path)
-        log_step(f"Voiceover script generated ({script_result['duration']}s)", "SUCCESS")
-        log_step(f"Script Preview: {script_result['script'][:100]}...", "SCRIPT")
+        log_step("Voiceover script generated (%ss)", "SUCCESS", script_result['duration'])
+        log_step("Script Preview: %s...", "SCRIPT", script_result['script'][:100])
         
         return jsonify({
             "success": True,
@@ -614,19 +621,15 @@ def generate_voiceover():
             "audio_file": main_module.OUTPUT_AUDIO
         })
     except Exception as e:
-        print(f"\n{'='*50}")
-        print(f"ERROR: Exception in generate_voiceover")
-        traceback.print_exc()
-        print(f"{'='*50}\n")
+        logger.exception("ERROR: Exception in generate_voiceover")
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/attach-audio', methods=['POST'])
 @login_required
+@background_capable
 def attach_audio():
     """Attach audio to video"""
-    print("\n" + "="*50)
     log_step("STEP 8: SYNCHRONIZING AUDIO & VIDEO", "SYNC")
-    print("="*50)
     try:
         data = request.json if request.is_json and request.json else {}
         video_path = data.get('video_path', main_module.FINAL_VIDEO)
@@ -634,7 +637,7 @@ def attach_audio():
         output_path = data.get('output_path', main_module.FINAL_VIDEO_WITH_VOICE)
         
         if not os.path.exists(video_path):
-            log_step(f"Video file not found: {video_path}", "ERROR")
+            log_step("Video file not found: %s", "ERROR", video_path)
             return jsonify({"error": f"Video file not found: {video_path}"}), 400
         
         # Get duration and use audio_service
@@ -649,38 +652,33 @@ def attach_audio():
                 script,
                 duration,
                 main_module.OUTPUT_AUDIO,
-                main_module.SAFE_AUDIO,
                 output_path
             )
         else:
-            # Just attach existing audio
-            audio_path = data.get('audio_path', main_module.SAFE_AUDIO)
+            # Just attach existing audio (padded while muxing only if it's shorter than the video)
+            audio_path = data.get('audio_path') or main_module.OUTPUT_AUDIO
             if not os.path.exists(audio_path):
-                log_step(f"Audio file not found: {audio_path}", "ERROR")
+                log_step("Audio file not found: %s", "ERROR", audio_path)
                 return jsonify({"error": f"Audio file not found: {audio_path}"}), 400
-            log_step(f"Attaching existing audio file: {audio_path}", "ATTACH")
-            main_module.attach_audio_to_video(video_path, audio_path, output_path)
+            log_step("Attaching existing audio file: %s", "ATTACH", audio_path)
+            main_module.attach_audio_to_video(video_path, audio_path, output_path, pad_to=duration)
             output_file = output_path
         
-        log_step(f"Audio attached successfully: {output_file}", "SUCCESS")
+        log_step("Audio attached successfully: %s", "SUCCESS", output_file)
         return jsonify({
             "success": True,
             "output_file": output_file
         })
     except Exception as e:
-        print(f"\n{'='*50}")
-        print(f"ERROR: Exception in attach_audio")
-        traceback.print_exc()
-        print(f"{'='*50}\n")
+        logger.exception("ERROR: Exception in attach_audio")
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/generate-captions', methods=['POST'])
 @login_required
+@background_capable
 def generate_captions():
     """Generate Instagram-style SRT captions using Whisper"""
-    print("\n" + "="*50)
     log_step("STEP 9: TRANSCRIBING AUDIO (AI CAPTIONS)", "WHISPER")
-    print("="*50)
     try:
         data = request.json if request.is_json and request.json else {}
         video_path = data.get('video_path', main_module.FINAL_VIDEO_WITH_VOICE)
@@ -688,37 +686,33 @@ def generate_captions():
         max_words = int(data.get('max_words', main_module.MAX_WORDS))
         
         if not os.path.exists(video_path):
-            log_step(f"Video file not found: {video_path}", "ERROR")
+            log_step("Video file not found: %s", "ERROR", video_path)
             return jsonify({"error": f"Video file not found: {video_path}"}), 400
         
         # Use caption_service to generate SRT
-        log_step(f"Transcribing audio from {video_path} using Whisper...", "WHISPER")
+        log_step("Transcribing audio from %s using Whisper...", "WHISPER", video_path)
         srt_file = caption_service.generate_srt(
             main_module,
             video_path,
             output_srt,
             max_words
         )
-        log_step(f"SRT generated: {srt_file}", "SUCCESS")
+        log_step("SRT generated: %s", "SUCCESS", srt_file)
         
         return jsonify({
             "success": True,
             "srt_file": srt_file
         })
     except Exception as e:
-        print(f"\n{'='*50}")
-        print(f"ERROR: Exception in generate_captions")
-        traceback.print_exc()
-        print(f"{'='*50}\n")
+        logger.exception("ERROR: Exception in generate_captions")
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/burn-captions', methods=['POST'])
 @login_required
+@background_capable
 def burn_captions():
     """Burn SRT captions into video"""
-    print("\n" + "="*50)
     log_step("STEP 10: FINAL RENDER (BURNING CAPTIONS)", "BURN")
-    print("="*50)
     try:
         data = request.json if request.is_json and request.json else {}
         video_path = data.get('video_path')
@@ -730,33 +724,32 @@ def burn_captions():
             return jsonify({"error": "video_path and srt_path are required"}), 400
         
         if not os.path.exists(video_path):
-            log_step(f"Video file not found: {video_path}", "ERROR")
+            log_step("Video file not found: %s", "ERROR", video_path)
             return jsonify({"error": f"Video file not found: {video_path}"}), 400
         if not os.path.exists(srt_path):
-            log_step(f"SRT file not found: {srt_path}", "ERROR")
+            log_step("SRT file not found: %s", "ERROR", srt_path)
             return jsonify({"error": f"SRT file not found: {srt_path}"}), 400
         
-        # Get optional parameters
-        font_name = data.get('font_name', os.getenv('CAPTION_FONT_NAME'))
-        font_size = data.get('font_size', int(os.getenv('CAPTION_FONT_SIZE', 40)))
-        font_color = data.get('font_color', os.getenv('CAPTION_FONT_COLOR', 'white'))
-        stroke_color = data.get('stroke_color', os.getenv('CAPTION_STROKE_COLOR', 'black'))
-        stroke_width = data.get('stroke_width', int(os.getenv('CAPTION_STROKE_WIDTH', 2)))
-        
-        # Handle position
-        pos_x = data.get('position_x', os.getenv('CAPTION_POSITION_X', 'center'))
-        pos_y = data.get('position_y', os.getenv('CAPTION_POSITION_Y', 'bottom'))
-        
-        if pos_x == 'center' and pos_y in ['top', 'bottom']:
-            position = (pos_x, pos_y)
-        elif pos_x.isdigit() and pos_y.isdigit():
-            position = ("axis", int(pos_x), int(pos_y))
+        # Get optional parameters (request overrides on top of the CAPTION_* defaults)
+        defaults = caption_service.caption_env()
+        font_name = data.get('font_name', defaults.font_name)
+        font_size = data.get('font_size', defaults.font_size)
+        font_color = data.get('font_color', defaults.font_color)
+        stroke_color = data.get('stroke_color', defaults.stroke_color)
+        stroke_width = data.get('stroke_width', defaults.stroke_width)
+        
+        # Handle position; only re-parse when the request overrides it
+        if 'position_x' in data or 'position_y' in data:
+            position = caption_service.parse_caption_position(
+                data.get('position_x', defaults.pos_x),
+                data.get('position_y', defaults.pos_y)
+            )
         else:
-            position = ("center", "bottom")
+            position = defaults.position
         
         # Use caption_service to burn captions
-        log_step("Burning captions using MoviePy and ImageMagick...", "BURN")
-        log_step(f"Styling: Font={font_name or 'Default'}, Size={font_size}, Color={font_color}, Stroke={stroke_color}", "STYLE")
+        log_step("Burning captions with ffmpeg/libass...", "BURN")
+        log_step("Styling: Font=%s, Size=%s, Color=%s, Stroke=%s", "STYLE", font_name or 'Default', font_size, font_color, stroke_color)
         result = caption_service.burn_captions(
             caption_module,
             video_path,
@@ -771,7 +764,7 @@ def burn_captions():
         )
         
         if result:
-            log_step(f"Final video with captions created: {result}", "SUCCESS")
+            log_step("Final video with captions created: %s", "SUCCESS", result)
             return jsonify({
                 "success": True,
                 "output_file": result
@@ -783,10 +776,7 @@ def burn_captions():
                 "error": "Failed to burn captions"
             }), 500
     except Exception as e:
-        print(f"\n{'='*50}")
-        print(f"ERROR: Exception in burn_captions")
-        traceback.print_exc()
-        print(f"{'='*50}\n")
+        logger.exception("ERROR: Exception in burn_captions")
         return jsonify({"error": str(e)}), 500
 
 # =====================================
@@ -802,9 +792,9 @@ def cleanup_pipeline_files(files_to_remove):
                 os.remove(path)
                 removed.append(path)
         except Exception as exc:
-            print(f"Warning: Could not remove {path}: {exc}")
+            logger.warning("Warning: Could not remove %s: %s", path, exc)
     if removed:
-        print(f"CLEANUP: Cleaned up {len(removed)} temporary files")
+        logger.info("CLEANUP: Cleaned up %d temporary files", len(removed))
     return removed
 
 
@@ -812,8 +802,7 @@ def cleanup_pipeline_files(files_to_remove):
 def debug_deapi():
     """Debug endpoint to test DEAPI connection and see response"""
     try:
-        import requests
-        url = "https://api.deapi.ai/api/v1/client/img2video"
+        url = main_module.DEAPI_SUBMIT_URL
         headers = {"Authorization": f"Bearer {main_module.DEAPI_KEY}"}
         
         # Create a dummy test
@@ -831,7 +820,7 @@ def debug_deapi():
         }
         
         # Try without file first to see error response
-        r = requests.post(url, data=test_data, headers=headers)
+        r = main_module._session().post(url, data=test_data, headers=headers)
         response_data = {
             "status_code": r.status_code,
             "headers": dict(r.headers),
@@ -848,32 +837,66 @@ def debug_deapi():
     except Exception as e:
         return jsonify({"error": str(e), "traceback": str(__import__('traceback').format_exc())}), 500
 
+@app.route('/api/task/<task_id>', methods=['GET'])
+@login_required
+def get_task(task_id):
+    """Poll a background task started with ?async=1"""
+    task = task_service.get(task_id, owner=current_user.get_id())
+    if task is None:
+        return jsonify({"error": "Task not found"}), 404
+    task.pop("owner", None)
+    return jsonify(task)
+
+# Only generated media is downloadable (never .env, source files, etc.)
+DOWNLOAD_EXTENSIONS = {'.mp4', '.mp3', '.srt'}
+# When running behind nginx, set e.g. X_ACCEL_REDIRECT_PREFIX=/_protected/ with
+# "location /_protected/ { internal; alias /app/; }" so nginx streams the file with sendfile
+# and the Flask thread is released as soon as the headers are sent.
+X_ACCEL_REDIRECT_PREFIX = os.getenv('X_ACCEL_REDIRECT_PREFIX', '')
+
 @app.route('/api/download/<filename>', methods=['GET'])
 @login_required
 def download_file(filename):
     """Download generated files"""
     try:
+        if (os.path.basename(filename) != filename or filename.startswith('.')
+                or os.path.splitext(filename)[1].lower() not in DOWNLOAD_EXTENSIONS):
+            return jsonify({"error": "File not allowed"}), 403
         if not os.path.exists(filename):
             return jsonify({"error": "File not found"}), 404
+        if X_ACCEL_REDIRECT_PREFIX:
+            response = Response(status=200)
+            response.headers['X-Accel-Redirect'] = X_ACCEL_REDIRECT_PREFIX.rstrip('/') + '/' + filename
+            response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+            return response
         return send_file(filename, as_attachment=True)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+# Output names are fixed once main_module is configured above
+GENERATED_FILES = tuple(
+    [main_module.FINAL_VIDEO, main_module.FINAL_VIDEO_WITH_VOICE,
+     main_module.OUTPUT_AUDIO, main_module.SRT_OUTPUT] +
+    list(main_module.SCENE_FILES.values())
+)
+
 @app.route('/api/list-files', methods=['GET'])
 @login_required
 def list_files():
     """List all generated files"""
     try:
         files = []
-        for file in [main_module.FINAL_VIDEO, main_module.FINAL_VIDEO_WITH_VOICE, 
-                     main_module.OUTPUT_AUDIO, main_module.SAFE_AUDIO, main_module.SRT_OUTPUT] + \
-                    list(main_module.SCENE_FILES.values()):
-            if os.path.exists(file):
-                files.append({
-                    "name": file,
-                    "size": os.path.getsize(file),
-                    "exists": True
-                })
+        for file in GENERATED_FILES:
+            # One stat per file instead of exists() + getsize()
+            try:
+                st = os.stat(file)
+            except FileNotFoundError:
+                continue
+            files.append({
+                "name": file,
+                "size": st.st_size,
+                "exists": True
+            })
         return jsonify({"files": files})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -885,47 +908,87 @@ def list_files():
 def merge_sort_leaderboard(arr):
     """
     Merge Sort algorithm to sort leaderboard by video_count in descending order.
+    Sorts index ranges of a single permutation against pre-extracted integer keys,
+    so there is no sub-list slicing and no dict lookup per comparison.
     """
-    if len(arr) <= 1:
+    n = len(arr)
+    if n <= 1:
         return arr
-    
-    mid = len(arr) // 2
-    left = merge_sort_leaderboard(arr[:mid])
-    right = merge_sort_leaderboard(arr[mid:])
-    
-    return merge(left, right)
 
-def merge(left, right):
-    result = []
-    i = j = 0
-    
-    while i < len(left) and j < len(right):
-        # Sort in descending order (highest video_count first)
-        if left[i]['video_count'] >= right[j]['video_count']:
-            result.append(left[i])
+    keys = [user['video_count'] for user in arr]
+    order = list(range(n))
+    buf = [0] * n
+    _merge_sort_range(order, buf, keys, 0, n)
+    return [arr[i] for i in order]
+
+def _merge_sort_range(order, buf, keys, lo, hi):
+    if hi - lo <= 1:
+        return
+    mid = (lo + hi) // 2
+    _merge_sort_range(order, buf, keys, lo, mid)
+    _merge_sort_range(order, buf, keys, mid, hi)
+    merge(order, buf, keys, lo, mid, hi)
+
+def merge(order, buf, keys, lo, mid, hi):
+    i, j, k = lo, mid, lo
+
+    while i < mid and j < hi:
+        # Sort in descending order (highest video_count first); >= keeps it stable
+        if keys[order[i]] >= keys[order[j]]:
+            buf[k] = order[i]
             i += 1
         else:
-            result.append(right[j])
+            buf[k] = order[j]
             j += 1
-            
-    result.extend(left[i:])
-    result.extend(right[j:])
-    return result
+        k += 1
+
+    buf[k:k + mid - i] = order[i:mid]
+    k += mid - i
+    buf[k:k + hi - j] = order[j:hi]
+    order[lo:hi] = buf[lo:hi]
+
+# Process-local cache: the leaderboard is the same for every viewer between writes
+LEADERBOARD_CACHE_TTL = float(os.getenv('LEADERBOARD_CACHE_TTL', 60))
+_leaderboard_cache = {"value": None, "expires": 0.0}
+_leaderboard_lock = threading.Lock()
+
+def invalidate_leaderboard_cache():
+    with _leaderboard_lock:
+        _leaderboard_cache["value"] = None
+
+def fetch_leaderboard():
+    """Cached leaderboard; refreshed from MongoDB at most every LEADERBOARD_CACHE_TTL seconds"""
+    with _leaderboard_lock:
+        if _leaderboard_cache["value"] is not None and time.monotonic() < _leaderboard_cache["expires"]:
+            return _leaderboard_cache["value"]
+        value = query_leaderboard()
+        _leaderboard_cache["value"] = value
+        _leaderboard_cache["expires"] = time.monotonic() + LEADERBOARD_CACHE_TTL
+        return value
+
+def query_leaderboard():
+    """
+    Top LEADERBOARD_LIMIT users by video_count, sorted and trimmed by MongoDB on the index.
+    Legacy users are backfilled at startup; $ifNull still covers a failed backfill.
+    """
+    pipeline = [
+        {"$sort": {"video_count": DESCENDING}},
+        {"$limit": LEADERBOARD_LIMIT},
+        {"$project": {"_id": 0, "username": 1, "video_count": {"$ifNull": ["$video_count", 0]}}},
+    ]
+    # Read from the primary: a refresh right after invalidate_leaderboard_cache() must see that write,
+    # and the TTL cache already keeps this query rare
+    users_data = list(users_collection.aggregate(pipeline))
+
+    # Keep the DSA Merge Sort (college project requirement); it now only sees the top N rows
+    return merge_sort_leaderboard(users_data)
 
 @app.route('/api/leaderboard', methods=['GET'])
 @login_required
 def get_leaderboard():
     """Fetch and return sorted leaderboard data"""
     try:
-        users_data = list(users_collection.find({}, {"username": 1, "video_count": 1, "_id": 0}))
-        
-        # Ensure every user has a video_count field (migration/safety)
-        for user in users_data:
-            if 'video_count' not in user:
-                user['video_count'] = 0
-                
-        # Use DSA Merge Sort
-        sorted_leaderboard = merge_sort_leaderboard(users_data)
+        sorted_leaderboard = fetch_leaderboard()
         
         return jsonify({"success": True, "leaderboard": sorted_leaderboard})
     except Exception as e:
@@ -940,6 +1003,7 @@ def increment_video_count():
             {"username": current_user.username},
             {"$inc": {"video_count": 1}}
         )
+        invalidate_leaderboard_cache()
         return jsonify({"success": True})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
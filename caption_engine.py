@@ -1,15 +1,175 @@
 import os
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import pysrt
-from moviepy.editor import VideoFileClip, TextClip, CompositeVideoClip
-from moviepy.config import change_settings as moviepy_change_settings
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont, ImageColor
 
-def change_settings(settings):
+# Tried after the requested font; Pillow searches the system font directories for bare names
+FALLBACK_FONTS = ["DejaVuSans-Bold.ttf", "arialbd.ttf", "Arial Bold.ttf"]
+
+FFMPEG_BINARY = os.getenv("FFMPEG_BINARY", "ffmpeg")
+FFPROBE_BINARY = os.getenv("FFPROBE_BINARY", "ffprobe")
+CAPTION_RENDER_WORKERS = int(os.getenv("CAPTION_RENDER_WORKERS", 4))
+
+def load_caption_font(font_name, font_size):
+    """
+    Resolve a caption font for Pillow. ImageMagick-style names such as 'Arial-Bold'
+    are tried as given, then common bold fonts, then Pillow's built-in font.
+    """
+    candidates = ([font_name] if font_name else []) + FALLBACK_FONTS
+    for candidate in candidates:
+        try:
+            return ImageFont.truetype(candidate, font_size)
+        except OSError:
+            continue
+    print(f"WARNING: No TrueType font found for {font_name!r}, using Pillow default")
+    return ImageFont.load_default()
+
+def _wrap_text(text, font, max_width, stroke_width):
+    lines = []
+    line = ""
+    for word in text.split():
+        trial = f"{line} {word}" if line else word
+        if not line or font.getlength(trial) + 2 * stroke_width <= max_width:
+            line = trial
+        else:
+            lines.append(line)
+            line = word
+    if line:
+        lines.append(line)
+    return "\n".join(lines)
+
+def render_caption(text, font, font_color, stroke_color, stroke_width, box_width):
+    """
+    Rasterize one caption to an RGBA array box_width wide, wrapped and centered
+    (the same layout TextClip(method='caption', size=(box_width, None)) produced).
+    """
+    wrapped = _wrap_text(text, font, box_width, stroke_width)
+    probe = ImageDraw.Draw(Image.new("RGBA", (1, 1)))
+    left, top, right, bottom = probe.multiline_textbbox(
+        (0, 0), wrapped, font=font, stroke_width=stroke_width, align="center"
+    )
+
+    img = Image.new("RGBA", (box_width, max(1, bottom - top)), (0, 0, 0, 0))
+    x = (box_width - (right - left)) // 2 - left
+    ImageDraw.Draw(img).multiline_text(
+        (x, -top), wrapped, font=font, fill=font_color,
+        stroke_width=stroke_width, stroke_fill=stroke_color, align="center"
+    )
+    return np.array(img)
+
+def _run(cmd):
+    proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"{os.path.basename(cmd[0])} failed ({proc.returncode}): {proc.stderr.strip()}")
+    return proc.stdout
+
+def probe_video_size(video_path):
+    """(width, height) of the first video stream via ffprobe"""
+    out = _run([
+        FFPROBE_BINARY, "-v", "error", "-select_streams", "v:0",
+        "-show_entries", "stream=width,height", "-of", "csv=p=0:s=x", video_path,
+    ])
+    w, h = out.strip().split("x")
+    return int(w), int(h)
+
+def _ass_color(color):
+    # ASS colours are &HAABBGGRR with 00 = opaque
+    r, g, b = ImageColor.getrgb(color)[:3]
+    return f"&H00{b:02X}{g:02X}{r:02X}"
+
+def _ass_time(ordinal_ms):
+    cs = ordinal_ms // 10
+    h, cs = divmod(cs, 360000)
+    m, cs = divmod(cs, 6000)
+    s, cs = divmod(cs, 100)
+    return f"{h}:{m:02}:{s:02}.{cs:02}"
+
+def srt_to_ass(srt_path, ass_path, size, font_name, font_size, font_color,
+               stroke_color, stroke_width, position):
     """
-    Configure MoviePy settings, specifically the ImageMagick binary path.
+    Convert an SRT file into an ASS script whose coordinates are the video's pixels,
+    so font size, outline and position mean the same thing as in the MoviePy path.
     """
-    if "IMAGEMAGICK_BINARY" in settings:
-        moviepy_change_settings({"IMAGEMAGICK_BINARY": settings["IMAGEMAGICK_BINARY"]})
-    print(f"SUCCESS: MoviePy settings updated: {settings}")
+    w, h = size
+    family, bold = font_name or "Arial-Bold", 0
+    if family.endswith("-Bold"):
+        family, bold = family[:-len("-Bold")], -1
+
+    margin_lr = int(w * 0.1) # Wrap text at 80% width
+    margin_v = int(h * 0.04)
+    pos_tag = ""
+    if isinstance(position, tuple) and position[0] == "axis":
+        # MoviePy placed the top-left of the 80%-wide caption box at (x, y)
+        alignment = 8
+        pos_tag = f"{{\\pos({position[1] + int(w * 0.4)},{position[2]})}}"
+    elif position[1] == "top":
+        alignment = 8
+    else:
+        alignment = 2
+
+    lines = [
+        "[Script Info]",
+        "ScriptType: v4.00+",
+        f"PlayResX: {w}",
+        f"PlayResY: {h}",
+        "WrapStyle: 0",
+        "ScaledBorderAndShadow: yes",
+        "",
+        "[V4+ Styles]",
+        "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, "
+        "Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, "
+        "Alignment, MarginL, MarginR, MarginV, Encoding",
+        f"Style: Caption,{family},{font_size},{_ass_color(font_color)},{_ass_color(font_color)},"
+        f"{_ass_color(stroke_color)},&H00000000,{bold},0,0,0,100,100,0,0,1,{stroke_width},0,"
+        f"{alignment},{margin_lr},{margin_lr},{margin_v},1",
+        "",
+        "[Events]",
+        "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text",
+    ]
+    for sub in pysrt.open(srt_path):
+        if sub.end.ordinal <= sub.start.ordinal:
+            continue
+        # libass has no escape for a literal backslash: a word joiner after it keeps text such as
+        # "\N" or "\h" from being read as an override. Done first, before the escapes added below.
+        text = sub.text.replace("\\", "\\\u2060").replace("{", "\\{").replace("\n", "\\N")
+        lines.append(
+            f"Dialogue: 0,{_ass_time(sub.start.ordinal)},{_ass_time(sub.end.ordinal)},Caption,,0,0,0,,{pos_tag}{text}"
+        )
+
+    with open(ass_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    return ass_path
+
+def _filter_path(path):
+    # Escape a path for use inside an ffmpeg filter argument
+    return path.replace("\\", "/").replace(":", "\\:").replace("'", "\\'")
+
+def burn_captions_ffmpeg(video_path, srt_path, output_path, font_name=None, font_size=40,
+                         font_color='white', stroke_color='black', stroke_width=2,
+                         position=('center', 'bottom')):
+    """
+    Burn captions in a single ffmpeg pass: libass rasterizes the text, audio is stream-copied.
+    """
+    fd, ass_path = tempfile.mkstemp(suffix=".ass", prefix="captions_")
+    os.close(fd)
+    try:
+        srt_to_ass(srt_path, ass_path, probe_video_size(video_path), font_name, font_size,
+                   font_color, stroke_color, stroke_width, position)
+        _run([
+            FFMPEG_BINARY, "-y", "-hide_banner", "-loglevel", "error",
+            "-i", video_path,
+            "-vf", f"ass={_filter_path(ass_path)}",
+            "-c:v", "libx264", "-preset", "veryfast",
+            "-c:a", "copy",
+            output_path,
+        ])
+    finally:
+        os.remove(ass_path)
+    return output_path
 
 def burn_captions(
     video_path, 
@@ -23,59 +183,78 @@ def burn_captions(
     position=('center', 'bottom')
 ):
     """
-    Burn SRT captions into a video file using MoviePy and ImageMagick.
+    Burn SRT captions into a video file. Uses ffmpeg + libass, falling back to the
+    MoviePy/Pillow compositor if ffmpeg can't do it (e.g. built without libass).
     """
     print(f"BURN: Burning captions into {video_path}...")
+    # Sizes may arrive as strings from request JSON; Pillow and the ASS style need ints
+    font_size, stroke_width = int(font_size), int(stroke_width)
+    try:
+        return burn_captions_ffmpeg(video_path, srt_path, output_path, font_name, font_size,
+                                    font_color, stroke_color, stroke_width, position)
+    except (RuntimeError, OSError, ValueError) as exc:
+        print(f"WARNING: ffmpeg caption burn failed, falling back to MoviePy: {exc}")
+
+    return burn_captions_moviepy(video_path, srt_path, output_path, font_name, font_size,
+                                 font_color, stroke_color, stroke_width, position)
+
+def burn_captions_moviepy(
+    video_path, 
+    srt_path, 
+    output_path, 
+    font_name=None, 
+    font_size=40, 
+    font_color='white', 
+    stroke_color='black', 
+    stroke_width=2, 
+    position=('center', 'bottom')
+):
+    """
+    Burn SRT captions into a video file using MoviePy, with captions rendered in-process by Pillow.
+    """
+    # MoviePy (imageio, proglog, ...) is only imported when the ffmpeg/libass path has failed
+    from moviepy.editor import VideoFileClip, ImageClip, CompositeVideoClip
     
     # Load the video
     video = VideoFileClip(video_path)
     
     # Load the subtitles
     subs = pysrt.open(srt_path)
+
+    # Every caption is drawn in-process by Pillow (no ImageMagick fork per subtitle)
+    box_width = int(video.w * 0.8) # Wrap text at 80% width
+
+    # Handle the specialized position format from app.py
+    actual_pos = position
+    if isinstance(position, tuple) and position[0] == "axis":
+        actual_pos = (position[1], position[2])
     
-    # Function to create a TextClip for each subtitle segment
-    def create_caption_clip(sub):
-        # MoviePy expects duration/timings in seconds
-        start_time = sub.start.to_time()
-        end_time = sub.end.to_time()
-        
-        # Convert time objects to total seconds
-        start_seconds = (sub.start.hours * 3600 + sub.start.minutes * 60 + 
-                        sub.start.seconds + sub.start.milliseconds / 1000.0)
-        end_seconds = (sub.end.hours * 3600 + sub.end.minutes * 60 + 
-                      sub.end.seconds + sub.end.milliseconds / 1000.0)
-        duration = end_seconds - start_seconds
-        
-        if duration <= 0:
-            return None
-
-        # Create the text clip
-        # Note: 'center' position in MoviePy can be (pos_x, pos_y)
-        # Handle the specialized position format from app.py
-        actual_pos = position
-        if isinstance(position, tuple) and position[0] == "axis":
-            actual_pos = (position[1], position[2])
-
-        txt_clip = TextClip(
-            sub.text,
-            fontsize=font_size,
-            color=font_color,
-            font=font_name or 'Arial-Bold',
-            stroke_color=stroke_color,
-            stroke_width=stroke_width,
-            method='caption',
-            size=(video.w * 0.8, None) # Wrap text at 80% width
-        ).set_start(start_seconds).set_duration(duration).set_position(actual_pos)
-        
-        return txt_clip
-
-    # Generate all caption clips
-    caption_clips = []
+    # MoviePy expects timings in seconds; pysrt keeps total milliseconds in .ordinal
+    timed_subs = []
     for sub in subs:
-        clip = create_caption_clip(sub)
-        if clip:
-            caption_clips.append(clip)
-    
+        start_seconds = sub.start.ordinal / 1000.0
+        duration = sub.end.ordinal / 1000.0 - start_seconds
+        if duration > 0:
+            timed_subs.append((start_seconds, duration, sub.text))
+
+    # Pre-render every distinct caption text once, in parallel, before MoviePy composes anything
+    # (each worker gets its own FreeType face; faces are not safe to share across threads)
+    texts = list(dict.fromkeys(text for _, _, text in timed_subs))
+    local = threading.local()
+
+    def render(text):
+        if not hasattr(local, "font"):
+            local.font = load_caption_font(font_name, font_size)
+        return render_caption(text, local.font, font_color, stroke_color, stroke_width, box_width)
+
+    with ThreadPoolExecutor(max_workers=min(CAPTION_RENDER_WORKERS, len(texts) or 1)) as ex:
+        frames = dict(zip(texts, ex.map(render, texts)))
+
+    caption_clips = [
+        ImageClip(frames[text]).set_start(start).set_duration(duration).set_position(actual_pos)
+        for start, duration, text in timed_subs
+    ]
+
     # Composite the video with all captions
     result = CompositeVideoClip([video] + caption_clips)
     
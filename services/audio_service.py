@@ -3,13 +3,14 @@
 This module handles:
 - Voiceover script generation using Gemini
 - TTS audio generation using ElevenLabs
-- Audio duration adjustment
-- Audio attachment to video
+- Audio duration adjustment and attachment to video (one ffmpeg pass)
 """
 
 from __future__ import annotations
 
-from typing import Dict, Any
+from typing import Dict, Any, List
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 import os
 
 
@@ -35,8 +36,8 @@ def generate_voiceover_script(main_module: Any, video_path: str) -> Dict[str, An
     filename = os.path.splitext(os.path.basename(video_path))[0]
     script_file = os.path.join(dir_name, f"{filename}_script.txt")
     
-    with open(script_file, "w", encoding="utf-8") as f:
-        f.write(script)
+    # Raw binary write: one encode, no text io layer (write_bytes loops over short writes)
+    Path(script_file).write_bytes(script.encode("utf-8"))
     print(f"INFO: Script saved to: {script_file}")
 
     return {
@@ -46,42 +47,60 @@ def generate_voiceover_script(main_module: Any, video_path: str) -> Dict[str, An
     }
 
 
+def generate_voiceover_scripts(main_module: Any, video_paths: List[str]) -> List[Dict[str, Any]]:
+    """Generate voiceover scripts for several videos concurrently.
+
+    Durations are probed in parallel first (ffprobe runs as a subprocess, so threads are
+    enough), then the Gemini calls are fanned out the same way.
+
+    Args:
+        main_module: The main module containing generate_script and get_video_duration
+        video_paths: Paths to the video files
+
+    Returns:
+        List of generate_voiceover_script results, in video_paths order
+    """
+    if not video_paths:
+        return []
+
+    with ThreadPoolExecutor(max_workers=min(len(video_paths), os.cpu_count() or 1)) as ex:
+        # Warms get_video_duration's cache so generate_voiceover_script doesn't re-probe
+        list(ex.map(main_module.get_video_duration, video_paths))
+
+    with ThreadPoolExecutor(max_workers=len(video_paths)) as ex:
+        return list(ex.map(lambda path: generate_voiceover_script(main_module, path), video_paths))
+
+
 def generate_and_attach_audio(
     main_module: Any,
     video_path: str,
     script: str,
     duration: float,
     output_audio_path: str,
-    safe_audio_path: str,
     output_video_path: str,
 ) -> str:
     """Generate TTS audio from script and attach to video.
 
+    The TTS stream is padded to the video duration and muxed in a single ffmpeg run
+    (video stream copied), so no intermediate duration-safe audio file is written.
+
     Args:
         main_module: The main module containing audio generation functions
         video_path: Path to the input video file
         script: The voiceover script text
         duration: Target audio duration in seconds
         output_audio_path: Path to save the raw generated audio
-        safe_audio_path: Path to save the duration-safe audio
         output_video_path: Path for the output video with audio
 
     Returns:
         Path to the output video with attached audio
     """
-    # Generate TTS audio using ElevenLabs
-    main_module.generate_voice(script, output_audio_path)
-
-    # Make audio safe (adjust duration to match video)
-    # Note: make_audio_safe exports to SAFE_AUDIO global in 9x16_srt.py usually.
-    # We need to ensure we call a version that accepts output path. 
-    main_module.make_audio_safe(output_audio_path, duration, safe_audio_path)
-
-    # Attach audio to video
-    main_module.attach_audio_to_video(
+    main_module.generate_voice_attached(
+        script,
         video_path,
-        safe_audio_path,
+        duration,
         output_video_path,
+        output_audio_path,
     )
 
     print(f"SUCCESS: Audio attached to video: {output_video_path}")
@@ -7,10 +7,65 @@ This module handles:
 
 from __future__ import annotations
 
+from dataclasses import dataclass
 from typing import Any, Optional, Tuple
 import os
 
 
+def parse_caption_position(pos_x: Any, pos_y: Any) -> Tuple:
+    """Map position_x/position_y to the (h, v) or ("axis", x, y) form caption_engine expects."""
+    pos_x, pos_y = str(pos_x), str(pos_y)
+    if pos_x == "center" and pos_y in ["top", "bottom"]:
+        return (pos_x, pos_y)
+    if pos_x.isdigit() and pos_y.isdigit():
+        return ("axis", int(pos_x), int(pos_y))
+    return ("center", "bottom")
+
+
+@dataclass(frozen=True, slots=True)
+class CaptionEnv:
+    """Caption styling read from the environment."""
+
+    font_name: Optional[str]
+    font_size: int
+    font_color: str
+    stroke_color: str
+    stroke_width: int
+    pos_x: str
+    pos_y: str
+    position: Tuple
+
+
+def _read_caption_env() -> CaptionEnv:
+    pos_x = os.getenv("CAPTION_POSITION_X", "center")
+    pos_y = os.getenv("CAPTION_POSITION_Y", "bottom")
+    return CaptionEnv(
+        font_name=os.getenv("CAPTION_FONT_NAME") or None,
+        font_size=int(os.getenv("CAPTION_FONT_SIZE", 40)),
+        font_color=os.getenv("CAPTION_FONT_COLOR", "white"),
+        stroke_color=os.getenv("CAPTION_STROKE_COLOR", "black"),
+        stroke_width=int(os.getenv("CAPTION_STROKE_WIDTH", 2)),
+        pos_x=pos_x,
+        pos_y=pos_y,
+        position=parse_caption_position(pos_x, pos_y),
+    )
+
+
+# Parsed once at import; call reload_caption_env() after changing the environment
+_CAPTION_ENV = _read_caption_env()
+
+
+def caption_env() -> CaptionEnv:
+    """Return the caption styling parsed from the CAPTION_* environment variables."""
+    return _CAPTION_ENV
+
+
+def reload_caption_env() -> None:
+    """Re-read the CAPTION_* environment variables used by caption_env()."""
+    global _CAPTION_ENV
+    _CAPTION_ENV = _read_caption_env()
+
+
 def generate_srt(
     main_module: Any,
     video_path: str,
@@ -49,7 +104,7 @@ def burn_captions(
     stroke_width: int = 2,
     position: Tuple[str, str] = ("center", "bottom"),
 ) -> Optional[str]:
-    """Burn captions into video with customizable styling using ImageMagick/MoviePy.
+    """Burn captions into video with customizable styling using ffmpeg/libass (MoviePy fallback).
 
     Args:
         caption_module: The caption module (e.g., try2) containing burn_captions
@@ -81,7 +136,7 @@ def burn_captions(
         print(f"SUCCESS: Final video with burned captions created: {output_path}")
         return output_path
     except Exception as exc:  # noqa: BLE001
-        print(f"Warning: Failed to burn captions with ImageMagick: {exc}")
+        print(f"Warning: Failed to burn captions: {exc}")
         return None
 
 
@@ -93,12 +148,13 @@ def burn_captions_with_env_config(
 ) -> Optional[str]:
     """Burn captions using configuration from environment variables.
 
-    Reads caption styling from environment variables:
+    Uses caption styling read from environment variables at import (see reload_caption_env):
     - CAPTION_FONT_NAME: Font name (optional)
     - CAPTION_FONT_SIZE: Font size in pixels (default: 40)
     - CAPTION_FONT_COLOR: Font color (default: "white")
     - CAPTION_STROKE_COLOR: Stroke color (default: "black")
     - CAPTION_STROKE_WIDTH: Stroke width (default: 2)
+    - CAPTION_POSITION_X / CAPTION_POSITION_Y: Position (default: "center" / "bottom")
 
     Args:
         caption_module: The caption module containing burn_captions
@@ -109,21 +165,17 @@ def burn_captions_with_env_config(
     Returns:
         Path to the output video with burned captions, or None if failed
     """
-    font_name = os.getenv("CAPTION_FONT_NAME") or None
-    font_size = int(os.getenv("CAPTION_FONT_SIZE", 40))
-    font_color = os.getenv("CAPTION_FONT_COLOR", "white")
-    stroke_color = os.getenv("CAPTION_STROKE_COLOR", "black")
-    stroke_width = int(os.getenv("CAPTION_STROKE_WIDTH", 2))
+    env = _CAPTION_ENV
 
     return burn_captions(
         caption_module=caption_module,
         video_path=video_path,
         srt_path=srt_path,
         output_path=output_path,
-        font_name=font_name,
-        font_size=font_size,
-        font_color=font_color,
-        stroke_color=stroke_color,
-        stroke_width=stroke_width,
-        position=("center", "bottom"),
+        font_name=env.font_name,
+        font_size=env.font_size,
+        font_color=env.font_color,
+        stroke_color=env.stroke_color,
+        stroke_width=env.stroke_width,
+        position=env.position,
     )
@@ -8,41 +8,43 @@ This module handles:
 
 from __future__ import annotations
 
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Union
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import os
-import time
 
-from moviepy.editor import VideoFileClip, concatenate_videoclips
 
+# Scenes generated at once by generate_all_scenes
+SCENE_CONCURRENCY = int(os.getenv("SCENE_CONCURRENCY", 4))
+# Frame rate of the merged reel (DEAPI renders at 30 fps)
+MERGE_FPS = 30
 
-def generate_scene_prompts(main_module: Any, temp_images: Dict[str, str]) -> Dict[str, str]:
+
+def generate_scene_prompts(
+    main_module: Any,
+    temp_images: Dict[str, Union[str, bytes]],
+) -> Dict[str, str]:
     """Generate scene prompts from images using Gemini.
 
     Args:
-        main_module: The main module containing SCENE_IMAGES and generate_scene_prompts_from_gemini
-        temp_images: Dictionary mapping scene keys to temporary image paths
+        main_module: The main module containing generate_scene_prompts_from_gemini
+        temp_images: Dictionary mapping scene keys to image paths or raw image bytes
 
     Returns:
         Dictionary mapping scene keys to generated prompts
     """
-    # Use temporary images to infer prompts without touching originals
-    original_images = main_module.SCENE_IMAGES.copy()
-    main_module.SCENE_IMAGES = temp_images
-    try:
-        scenes = main_module.generate_scene_prompts_from_gemini(temp_images)
-        return scenes
-    finally:
-        # Always restore original config
-        main_module.SCENE_IMAGES = original_images
+    # The images are passed explicitly, so main_module.SCENE_IMAGES is never swapped; a swap
+    # would leak one request's uploads into another request's default images
+    return main_module.generate_scene_prompts_from_gemini(temp_images)
 
 
 def generate_single_scene(
     main_module: Any,
     scene_key: str,
     prompt: str,
-    temp_image_path: str,
+    temp_image_path: Union[str, bytes],
     output_file: str,
     generate_scene_with_retry,
+    work_dir: Optional[str] = None,
 ) -> Dict[str, Any]:
     """Generate a single scene video with retry logic.
 
@@ -50,9 +52,10 @@ def generate_single_scene(
         main_module: The main module containing scene configuration
         scene_key: Key identifying the scene (e.g., "scene1")
         prompt: The prompt for scene generation
-        temp_image_path: Path to the temporary image for this scene
+        temp_image_path: Path to the image for this scene, or raw uploaded image bytes
         output_file: Path where the generated video should be saved
         generate_scene_with_retry: Retry function for scene generation
+        work_dir: Directory for the 9:16 safe image (defaults to the image's directory)
 
     Returns:
         Dictionary with scene generation result containing:
@@ -62,11 +65,14 @@ def generate_single_scene(
         - error: Error message (if failed)
     """
     try:
-        # Create safe image in the same directory as temp_image_path
-        dir_name = os.path.dirname(temp_image_path)
-        safe_img = os.path.join(dir_name, f"safe_{scene_key}.png")
-        
-        main_module.convert_to_vertical_safe(temp_image_path, safe_img)
+        if isinstance(temp_image_path, str):
+            # Create safe image in work_dir, or next to temp_image_path
+            dir_name = work_dir if work_dir is not None else os.path.dirname(temp_image_path)
+            safe_img = os.path.join(dir_name, f"safe_{scene_key}.png")
+            main_module.convert_to_vertical_safe(temp_image_path, safe_img)
+        else:
+            # Uploaded bytes stay in memory all the way to DEAPI
+            safe_img = main_module.convert_to_vertical_safe(temp_image_path)
 
         print(f"Generating {scene_key}...")
         success, error_msg = generate_scene_with_retry(
@@ -78,6 +84,13 @@ def generate_single_scene(
         )
 
         if success:
+            # Probed as each scene lands; probe_video_stream caches the result for merge_scenes
+            video_info = main_module.probe_video_stream(output_file)
+            target = (main_module.TARGET_W, main_module.TARGET_H)
+            if video_info is not None and (video_info[:2] != target or round(video_info[2]) != MERGE_FPS):
+                # One-time fix-up here keeps the merge a pure stream copy
+                print(f"INFO: {scene_key} came back as {video_info}; conforming to {target} @ {MERGE_FPS} fps")
+                main_module.conform_video(output_file, *target, MERGE_FPS)
             return {
                 "scene": scene_key,
                 "status": "success",
@@ -102,58 +115,82 @@ def generate_single_scene(
 def generate_all_scenes(
     main_module: Any,
     scenes: Dict[str, str],
-    temp_images: Dict[str, str],
+    temp_images: Dict[str, Union[str, bytes]],
     output_files: Dict[str, str],
     generate_scene_with_retry,
     required_scenes: List[str] = None,
+    work_dir: Optional[str] = None,
 ) -> List[Dict[str, Any]]:
-    """Generate all scenes with retry logic and 20-second spacing.
+    """Generate all scenes concurrently with retry logic.
+
+    Scenes are dispatched to a thread pool (SCENE_CONCURRENCY workers, default 4); DEAPI
+    concurrency and 429 handling are enforced by generate_scene_with_retry, so submissions
+    are not spaced out with sleeps.
 
     Args:
         main_module: The main module containing scene configuration
         scenes: Dictionary mapping scene keys to prompts
-        temp_images: Dictionary mapping scene keys to temporary image paths
+        temp_images: Dictionary mapping scene keys to image paths or raw image bytes
         output_files: Dictionary mapping scene keys to output video paths
         generate_scene_with_retry: Retry function for scene generation
         required_scenes: List of required scene keys (defaults to ["scene1", "scene2", "scene3", "scene4"])
+        work_dir: Directory for the 9:16 safe images (defaults to each image's directory)
 
     Returns:
-        List of scene result dictionaries
+        List of scene result dictionaries, in required_scenes order
     """
     if required_scenes is None:
         required_scenes = ["scene1", "scene2", "scene3", "scene4"]
 
-    scene_results: List[Dict[str, Any]] = []
+    scene_results: List[Optional[Dict[str, Any]]] = [None] * len(required_scenes)
 
-    for key in required_scenes:
-        if key not in scenes:
-            scene_results.append(
-                {
+    with ThreadPoolExecutor(max_workers=SCENE_CONCURRENCY) as ex:
+        futures = {}
+        for i, key in enumerate(required_scenes):
+            if key not in scenes:
+                scene_results[i] = {
                     "scene": key,
                     "status": "skipped",
                     "reason": "No prompt generated",
                 }
+                continue
+
+            print(f"Submitting {key}...")
+            future = ex.submit(
+                generate_single_scene,
+                main_module,
+                key,
+                scenes[key],
+                temp_images[key],
+                output_files.get(key, f"{key}.mp4"),
+                generate_scene_with_retry,
+                work_dir=work_dir,
             )
-            continue
-
-        result = generate_single_scene(
-            main_module,
-            key,
-            scenes[key],
-            temp_images[key],
-            output_files.get(key, f"{key}.mp4"),
-            generate_scene_with_retry,
-        )
-        scene_results.append(result)
+            futures[future] = i
 
-        # Add 20-second delay between scenes (except after the last one)
-        if key != required_scenes[-1]:
-            print("Waiting 20 seconds before next scene...")
-            time.sleep(20)
+        for future in as_completed(futures):
+            scene_results[futures[future]] = future.result()
 
     return scene_results
 
 
+def _existing_files(paths: List[str]) -> set:
+    """Return the subset of paths that exist as files, with one directory listing per parent dir."""
+    by_dir: Dict[str, List[str]] = {}
+    for path in paths:
+        by_dir.setdefault(os.path.dirname(path), []).append(path)
+
+    present = set()
+    for dir_name, dir_paths in by_dir.items():
+        try:
+            with os.scandir(dir_name or ".") as it:
+                names = {entry.name for entry in it if entry.is_file()}
+        except OSError:
+            continue
+        present.update(p for p in dir_paths if os.path.basename(p) in names)
+    return present
+
+
 def merge_scenes(
     main_module: Any,
     scene_results: List[Dict[str, Any]],
@@ -162,7 +199,7 @@ def merge_scenes(
     """Merge successful scenes into a single video.
 
     Args:
-        main_module: The main module containing TARGET_W, TARGET_H
+        main_module: The main module containing TARGET_W, TARGET_H and the ffmpeg helpers
         scene_results: List of scene result dictionaries
         output_file: The path for the final merged video
 
@@ -176,36 +213,33 @@ def merge_scenes(
     if not successful_scenes:
         raise ValueError("No successful scenes found to merge")
 
-    successful_scene_files: List[str] = []
-    for r in successful_scenes:
-        path = r.get("output_file")
-        if path and os.path.exists(path):
-            successful_scene_files.append(path)
+    present = _existing_files([r.get("output_file") for r in successful_scenes if r.get("output_file")])
+    successful_scene_files = [r["output_file"] for r in successful_scenes if r.get("output_file") in present]
 
     if not successful_scene_files:
         raise ValueError("No scene files found to merge after generation")
 
-    clips = [VideoFileClip(p) for p in successful_scene_files]
-    try:
-        final = concatenate_videoclips(clips, method="compose")
-        final = final.resize((main_module.TARGET_W, main_module.TARGET_H))
-        
-        # OPTIMIZATION: threads=1 and preset='ultrafast' drastically reduce memory usage
-        # This prevents the "Worker timeout" or "Killed" error on Render free tier
-        final.write_videofile(
-            output_file, 
-            fps=30, 
-            threads=1, 
-            preset='ultrafast',
-            codec='libx264',
-            audio_codec='aac'
-        )
-    finally:
-        for c in clips:
-            try:
-                c.close()
-            except Exception:  # noqa: BLE001
-                pass
+    target_w, target_h = main_module.TARGET_W, main_module.TARGET_H
+    # DEAPI renders every clip at the target size and 30 fps, so the usual case is a pure
+    # stream copy; only re-encode (one ffmpeg pass, no Python frame loop) when a clip differs.
+    # Clips generated in this process hit probe_video_stream's cache; any others are probed at once.
+    with ThreadPoolExecutor(max_workers=len(successful_scene_files)) as ex:
+        probes = list(ex.map(main_module.probe_video_stream, successful_scene_files))
+    uniform = all(
+        probe is not None and probe[:2] == (target_w, target_h) and round(probe[2]) == MERGE_FPS
+        for probe in probes
+    )
+    if uniform:
+        main_module.concat_videos(successful_scene_files, output_file)
+    else:
+        print(f"INFO: Scene clips differ in size/fps; re-encoding during merge ({main_module.video_encoder_args()[1]})")
+        main_module.encode_with_fallback(lambda encoder_args: main_module.concat_videos(successful_scene_files, output_file, [
+            "-vf", f"scale={target_w}:{target_h}:flags=bicubic,setsar=1",
+            "-r", str(MERGE_FPS),
+            *encoder_args,
+            "-c:a", "aac",
+            "-threads", "0",
+        ]))
 
     print(
         f"\nSUCCESS: FINAL VIDEO READY: {output_file} "
@@ -0,0 +1,98 @@
+"""Task service for running long pipeline steps in the background.
+
+This module handles:
+- Submitting work to a process-local thread pool
+- Tracking task status/result by task id for polling endpoints
+"""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+import os
+import threading
+import time
+import traceback
+import uuid
+
+
+TASK_WORKERS = int(os.getenv("TASK_WORKERS", 4))
+# Finished tasks kept for polling before the oldest are dropped
+MAX_TRACKED_TASKS = int(os.getenv("MAX_TRACKED_TASKS", 200))
+
+_executor = ThreadPoolExecutor(max_workers=TASK_WORKERS, thread_name_prefix="task")
+_tasks: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def _set(task_id: str, **fields: Any) -> None:
+    with _lock:
+        if task_id in _tasks:
+            _tasks[task_id].update(fields)
+
+
+def _prune() -> None:
+    # Caller holds _lock
+    while len(_tasks) > MAX_TRACKED_TASKS:
+        oldest_id, oldest = next(iter(_tasks.items()))
+        if oldest["status"] in ("queued", "running"):
+            break
+        _tasks.pop(oldest_id)
+
+
+def submit(fn: Callable[[], Any], owner: Optional[str] = None, name: str = "") -> str:
+    """Queue a callable on the task pool.
+
+    Args:
+        fn: Zero-argument callable to run; its return value becomes the task result
+        owner: Optional owner id (e.g. user id) checked when the task is fetched
+        name: Human-readable task name for logs/status
+
+    Returns:
+        The new task id
+    """
+    task_id = uuid.uuid4().hex
+    with _lock:
+        _tasks[task_id] = {
+            "task_id": task_id,
+            "name": name,
+            "owner": owner,
+            "status": "queued",
+            "result": None,
+            "error": None,
+            "created_at": time.time(),
+            "finished_at": None,
+        }
+        _prune()
+
+    def _run() -> None:
+        _set(task_id, status="running")
+        try:
+            result = fn()
+            _set(task_id, status="finished", result=result, finished_at=time.time())
+        except Exception as exc:  # noqa: BLE001
+            traceback.print_exc()
+            _set(task_id, status="failed", error=str(exc), finished_at=time.time())
+
+    _executor.submit(_run)
+    print(f"TASK: Queued {name or 'task'} as {task_id}")
+    return task_id
+
+
+def get(task_id: str, owner: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Return a copy of a task's state, or None if unknown (or owned by someone else).
+
+    Args:
+        task_id: Id returned by submit
+        owner: If given, must match the owner the task was submitted with
+
+    Returns:
+        Dictionary with task_id, name, status ("queued", "running", "finished", "failed"),
+        result, error and timestamps
+    """
+    with _lock:
+        task = _tasks.get(task_id)
+        if task is None or (owner is not None and task["owner"] != owner):
+            return None
+        return dict(task)